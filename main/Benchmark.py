@@ -1,7 +1,21 @@
+import argparse
+import csv
+import json
+import multiprocessing
 import os
+import random
+import signal
 import sys
 import time
-from CDCL import CDCLSolver
+
+import batch
+import my_logger
+import my_parser
+import result_cache
+from CDCL import CDCLSolver, peak_memory_mb
+
+RESULT_FIELDS = ["instance", "heuristic", "restart", "expected", "answer", "correct", "time",
+                 "decisions", "conflicts", "propagations", "peak_memory_kb", "cached", "error"]
 
 
 def test_all(root, PBV_heuristic="DLIS"):
@@ -16,31 +30,20 @@ def test_all(root, PBV_heuristic="DLIS"):
         print("-----------------------------------")
 
 
-def test(directory, sat="SAT", PBV_heuristic="DLIS"):
+def test(directory, sat="SAT", PBV_heuristic="DLIS", workers=None):
+    inputs = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".cnf")]
     total_branching = 0
-    index = 1
-    num_total_test = len(os.listdir(directory))
-    alert_interval = set([i * int(num_total_test / 10) for i in range(1, 11)])
     total_time = 0
-    for test_input in os.listdir(directory):
-        if test_input.endswith(".cnf"):
-            start_time = time.time()
-            solver = CDCLSolver(os.path.join(directory, test_input), PBV_heuristic)
-            answer = solver.solve()
-            end_time = time.time()
-            total_time += end_time - start_time
-            total_branching += solver.num_PBV_invocations
-            if not check_answer(answer, sat):
-                print(f"Error at: {test_input}")
-                return
-            # print(answer)
-        # if index in alert_interval:
-            # print(f"Done {index} out of {num_total_test} testcases.")
-        index += 1
+    for path, answer, stats in batch.solve_many(inputs, workers, {"heuristic": PBV_heuristic}):
+        if answer == "ERROR" or not check_answer(answer, sat):
+            print(f"Error at: {os.path.basename(path)}")
+            return
+        total_time += stats["elapsed"]
+        total_branching += stats["num_decisions"]
     print(f"Total time: {total_time}")
-    print(f"Average time: {total_time / num_total_test}")
+    print(f"Average time: {total_time / len(inputs)}")
     print(f"Total branching: {total_branching}")
-    print(f"Average branching: {total_branching / num_total_test}")
+    print(f"Average branching: {total_branching / len(inputs)}")
 
 
 def check_answer(answer, sat):
@@ -50,13 +53,178 @@ def check_answer(answer, sat):
         return answer == "UNSAT"
 
 
+def expected_answer(directory):
+    """Expected answer for the instances of a directory, uuf* are UNSAT and uf* are SAT"""
+    name = os.path.basename(os.path.normpath(directory))
+    if name.startswith("uuf"):
+        return "UNSAT"
+    if name.startswith("uf"):
+        return "SAT"
+    return None
+
+
+def collect_instances(root):
+    """List (path, expected answer) for every .cnf file in the directories under `root`"""
+    instances = []
+    for directory in sorted(os.listdir(root)):
+        full_dir = os.path.join(root, directory)
+        if not os.path.isdir(full_dir):
+            continue
+        expected = expected_answer(full_dir)
+        for test_input in sorted(os.listdir(full_dir)):
+            if test_input.endswith(".cnf"):
+                instances.append((os.path.join(full_dir, test_input), expected))
+    return instances
+
+
+class InstanceTimeout(Exception):
+    pass
+
+
+def raise_timeout(signum, frame):
+    raise InstanceTimeout()
+
+
+def solve_instance(task):
+    """
+    Solve one instance in a worker process and return its result record. With a cache directory,
+    an instance whose clauses were solved before is answered from the cache without search.
+    """
+    path, expected, heuristic, restart, timeout, max_conflicts, seed, cache_dir = task
+    # The randomized heuristics make the same choices on every run
+    random.seed(seed)
+    result = {"instance": path, "heuristic": heuristic, "restart": restart, "expected": expected,
+              "answer": None, "correct": None, "time": None, "decisions": None, "conflicts": None,
+              "propagations": None, "peak_memory_kb": None, "cached": False, "error": None}
+    # Wall-clock limit through SIGALRM, only available on Unix
+    use_alarm = timeout and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    solver = None
+    start_time = time.time()
+    try:
+        formula = my_parser.read_file_flat(path)
+        cache = key = entry = None
+        if cache_dir:
+            cache = result_cache.ResultCache(cache_dir)
+            # The stats compared across runs depend on the settings, not only on the formula
+            settings = {"heuristic": heuristic, "restart": restart, "max_conflicts": max_conflicts, "seed": seed}
+            key = result_cache.formula_key(formula[0], settings)
+            entry = cache.get(key)
+        if entry is not None:
+            answer = entry["answer"]
+            result["cached"] = True
+            result["decisions"] = entry["stats"]["num_decisions"]
+            result["conflicts"] = entry["stats"]["num_conflicts"]
+            result["propagations"] = entry["stats"]["num_propagations"]
+        else:
+            solver = CDCLSolver(path, heuristic, restart, formula=formula)
+            solver.max_conflicts = max_conflicts
+            answer = solver.solve()
+            if cache and answer != "UNKNOWN":
+                cache.put(key, answer, solver.stats.as_dict())
+        result["answer"] = answer if answer in ("UNSAT", "UNKNOWN") else "SAT"
+    except InstanceTimeout:
+        result["answer"] = "TIMEOUT"
+    except Exception as e:
+        result["answer"] = "ERROR"
+        result["error"] = repr(e)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    result["time"] = time.time() - start_time
+
+    if solver is not None:
+        result["decisions"] = solver.stats.num_decisions
+        result["conflicts"] = solver.stats.num_conflicts
+        result["propagations"] = solver.stats.num_propagations
+    result["peak_memory_kb"] = round(peak_memory_mb() * 1024)
+    if expected is not None and result["answer"] in ("SAT", "UNSAT"):
+        result["correct"] = result["answer"] == expected
+    return result
+
+
+def run_parallel(instances, heuristics, restart=False, workers=None, timeout=None, max_conflicts=None, seed=0,
+                 cache_dir=None):
+    """
+    Solve every instance with every heuristic over a pool of `workers` processes and yield the
+    result records as they complete. Each instance runs in a fresh process so that its peak
+    memory is measured on its own. Answers are looked up and stored in the result_cache
+    directory `cache_dir` if given.
+    """
+    tasks = [(path, expected, heuristic, restart, timeout, max_conflicts, seed, cache_dir)
+             for heuristic in heuristics for path, expected in instances]
+    with multiprocessing.Pool(workers or os.cpu_count(), maxtasksperchild=1) as pool:
+        for result in pool.imap_unordered(solve_instance, tasks):
+            yield result
+
+
+def write_json(results, filepath):
+    with open(filepath, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def write_csv(results, filepath):
+    with open(filepath, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def print_summary(results):
+    """Print totals per heuristic and instance directory"""
+    groups = {}
+    for result in results:
+        key = (result["heuristic"], os.path.dirname(result["instance"]))
+        groups.setdefault(key, []).append(result)
+    for (heuristic, directory), group in sorted(groups.items()):
+        solved = [r for r in group if r["answer"] in ("SAT", "UNSAT")]
+        wrong = [r for r in group if r["correct"] is False]
+        # The time of a cached result is that of the lookup
+        cached = [r for r in group if r["cached"]]
+        total_time = sum(r["time"] for r in group if not r["cached"])
+        print(f"{heuristic} {directory}: solved {len(solved)}/{len(group)}, wrong {len(wrong)}, "
+              f"total time {total_time:.2f}{f' ({len(cached)} cached not timed)' if cached else ''}, "
+              f"total branching {sum(r['decisions'] or 0 for r in group)}, "
+              f"total conflicts {sum(r['conflicts'] or 0 for r in group)}")
+        for r in wrong:
+            print(f"Error at: {r['instance']}")
+
+
 if __name__ == "__main__":
     available_heuristics = ["DLIS", "RDLIS", "DLCS", "RDLCS", "Lishuo", "Lishuo2", "2-Clause",
                             "MOM", "JW", "VSIDS", "Random", "Ordered", "BigBang", "SurpriseMe"]
     if len(sys.argv) < 2:
-        print("Usage: python Benchmark.py <heuristic>")
+        print("Usage: python Benchmark.py <heuristic>[,<heuristic>...] [options], -h for the options")
         print("Available heuristics: " + str(available_heuristics))
         exit(1)
 
-    heuristic = sys.argv[1]
-    test_all("../data/test", "BigBang")
+    parser = argparse.ArgumentParser(description="Solve every instance under a directory")
+    parser.add_argument("heuristics", help="comma separated branching heuristics")
+    parser.add_argument("--root", default="../data/test", help="directory of instance directories")
+    parser.add_argument("--restart", default="0", help="restart policy, as for CDCL.py")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, all cores by default")
+    parser.add_argument("--timeout", type=float, default=None, help="wall-clock seconds per instance")
+    parser.add_argument("--max-conflicts", type=int, default=None, help="conflicts per instance")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of every run")
+    parser.add_argument("--cache", default=None, help="directory of the result cache, no cache by default")
+    parser.add_argument("--json", default=None, help="write per-instance results to this JSON file")
+    parser.add_argument("--csv", default=None, help="write per-instance results to this CSV file")
+    args = parser.parse_args()
+    my_logger.init_logger()
+
+    results = []
+    start_time = time.time()
+    for result in run_parallel(collect_instances(args.root), args.heuristics.split(","), args.restart,
+                               args.workers, args.timeout, args.max_conflicts, args.seed, args.cache):
+        results.append(result)
+        print(f"[{len(results)}] {result['heuristic']} {result['instance']}: "
+              f"{result['answer']} in {result['time']:.2f}s{' (cached)' if result['cached'] else ''}")
+    print("-----------------------------------")
+    print_summary(results)
+    print(f"Wall-clock time: {time.time() - start_time:.2f}")
+    if args.json:
+        write_json(results, args.json)
+    if args.csv:
+        write_csv(results, args.csv)
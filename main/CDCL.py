@@ -1,13 +1,30 @@
 import logging
 import math
 import operator
+import os
 import random
+import signal
 import sys
 import time
-from collections import deque
-
+from array import array
+from collections import defaultdict, deque
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import checkpoint
+import clause_arena
+import drat
+import my_heap
 import my_logger
 import my_parser
+import my_tracer
+import preprocess as preprocessing
+import restart as restart_policies
+import stats as solver_stats
+import vectorized as vectorized_scoring
 
 TRUE = 1
 FALSE = 0
@@ -16,117 +33,774 @@ UNDEFINED = -1
 
 class CDCLSolver:
 
-    def __init__(self, filepath, PBV_heuristic="DLIS", restart=False):
-        my_logger.init_logger()
+    def __init__(self, filepath, PBV_heuristic="DLIS", restart=False, formula=None, preprocess=False,
+                 proof=None, vectorized=False):
+        """
+        Solve the CNF file at `filepath`, or `formula` if given: the (literals, num_variables, ...)
+        tuple returned by my_parser.read_file_flat, so that a file is only parsed once.
+        With `preprocess`, the formula is simplified before search (see preprocess.Preprocessor).
+        With `proof` (a drat.ProofWriter), a DRAT proof of the clauses derived and deleted is
+        written, ending with the empty clause when the formula is UNSAT. Clauses given to
+        add_clause are part of the formula that proof refutes.
+        With `vectorized`, the counting heuristics are scored with NumPy (see vectorized.py).
+        """
         logging.info("---------Initializing CDCL Solver---------")
         self.filepath = filepath
-        self.clauses, self.num_variables = my_parser.read_file_and_parse(filepath)
-        self.atomic_prop = self.get_ap(self.clauses)
-        self.learnt_clauses = set()
-        self.assignments = {lit: UNDEFINED for lit in self.atomic_prop}
-
-        self.level = 0
-        self.implication_graph = dict((v, Node(v, UNDEFINED)) for v in self.atomic_prop)
-        self.branching_var = set()
-        self.guess_trail = {}  # keep track of guesses
-        self.propagation_trail = {}  # dict - level:int -> literals:set, keep track of unit propagations
-        self.num_PBV_invocations = 0  # number of pick branching var invocations
+        if formula is None:
+            formula = my_parser.read_file_flat(filepath)
+        literals, self.num_variables = formula[0], formula[1]
+        # Variables of the input formula, the model returned by solve() covers all of them
+        self.input_variables = set(map(abs, literals))
+        self.input_variables.discard(0)
+        self.input_literals = None
+        self.preprocessor = None
+        self.proof = proof
+        if preprocess:
+            # Keep the input formula to check models against it
+            self.input_literals = array("i", literals)
+            self.preprocessor = preprocessing.Preprocessor(my_parser.iter_clauses(literals), proof=proof)
+            literals = array("i")
+            for clause in self.preprocessor.run():
+                literals.extend(clause)
+                literals.append(0)
+        self.atomic_prop = set(map(abs, literals))
+        self.atomic_prop.discard(0)
+        self.num_variables = max([self.num_variables] + list(self.input_variables))
+        # Every clause, original and learnt, lives in one flat array
+        self.arena = clause_arena.ClauseArena()
+
+        # Assignment trail: every assigned literal in assignment order, trail_lim[i] is the index
+        # in trail where decision level i + 1 starts. Per-variable arrays are indexed by variable.
+        self.trail = []
+        self.trail_lim = []
+        self.assignments = [UNDEFINED] * (self.num_variables + 1)
+        self.levels = [-1] * (self.num_variables + 1)  # decision level of each assigned variable
+        self.reasons = [None] * (self.num_variables + 1)  # clause that caused unit prop, None for guesses
+        self.seen = [False] * (self.num_variables + 1)  # scratch flags for conflict analysis
         self.PBV_heuristic = PBV_heuristic
-        self.vsid_activity = {lit: 0 for lit in self.atomic_prop} # Weight for VSID
-        self.vsid_decay = 0.3
-
+        # Weight for VSID. Instead of decaying every activity after each conflict, the bump
+        # increment grows by 1 / vsid_decay and everything is rescaled when it gets too large.
+        self.vsid_activity = [0.0] * (self.num_variables + 1)
+        self.vsid_increment = 1.0
+        self.vsid_decay = 0.95
+        self.vsid_rescale_limit = 1e100
+        # Max-heap of variables keyed by activity, every unassigned variable is in it
+        self.vsid_heap = my_heap.Heap(self.vsid_activity, self.atomic_prop)
+        # Phase saving: VSIDS gives a variable the value it had when it was last unassigned
+        self.phases = [TRUE] * (self.num_variables + 1)
+
+        # Learnt clause database, reduced every `reduce_interval` conflicts (growing by
+        # `reduce_increment`) by deleting the worst half of the clauses that are neither
+        # glue clauses (LBD <= 2) nor the reason of a current assignment
+        self.learnt_db = []  # list of cref of learnt clauses
+        # Budgets: solve() gives up with "UNKNOWN" once the total conflicts, decisions or
+        # propagations reach their maximum, after max_time seconds within one call, once the
+        # resident memory of the process reaches max_memory megabytes (see memory_mb), or after
+        # interrupt() was called. stop_reason tells which one, and solve() can be called again
+        # to carry on.
+        self.max_conflicts = None
+        self.max_decisions = None
+        self.max_propagations = None
+        self.max_time = None
+        self.max_memory = None
+        self.interrupted = False
+        self.stop_reason = None
+        self.deadline = None
+        self.memory_baseline = 0  # peak memory when solve() was called, where memory_mb() is unknown
+        self.budget_countdown = 0  # checks left before the clock and memory are looked at again
+        self.reduce_interval = 2000
+        self.reduce_increment = 300
+        self.next_reduce = self.reduce_interval
+        self.clause_increment = 1.0
+        self.clause_decay = 0.999
+        self.clause_rescale_limit = 1e20
+
+        # Restarts keep the activities and learnt clauses. With VSIDS, the part of the trail that
+        # would be decided again in the same order is kept as well when reuse_trail is set.
         self.restart = restart
-        self.restart_counter = 0
-        self.restart_factor = 1.1
-        self.restart_threshold = 100
+        self.restart_policy = restart_policies.make_restart_policy(restart)
+        self.reuse_trail = True
+
+        # Counters and optional phase timers. Every `progress_interval` conflicts, and when
+        # solve() returns, each of progress_callbacks is called with the stats.
+        self.stats = solver_stats.SolverStats()
+        self.progress_interval = None
+        self.progress_callbacks = []
+        self.tracer = None  # my_tracer.Tracer once enable_tracing has been called
+        # With checkpoint_path set, the learnt clauses, activities and phases are saved there
+        # every `checkpoint_interval` conflicts and when solve() returns (see save_checkpoint)
+        self.checkpoint_path = None
+        self.checkpoint_interval = 10000
+
+        # Incremental solving: solve() may be called again after add_clause() or with other
+        # assumptions, keeping learnt clauses and activities. Assumptions are decided first,
+        # one decision level each.
+        self.assumptions = []
+        self.core = []  # assumptions responsible for the last "UNSAT" answer, empty if none are
+        self.inconsistent = False  # the clauses are UNSAT whatever the assumptions
+
+        # Two-watched-literal scheme: the first two literals of every clause of length >= 2 are
+        # watched. A clause only needs to be visited when one of its watched literals becomes false.
+        self.watches = {}  # dict - literal:int -> list of cref of clauses watching that literal
+        self.unit_clauses = []  # cref of clauses of length 1 which cannot be watched twice
+        self.propagation_head = 0  # index in trail of the next literal to propagate
+        for clause in my_parser.iter_clauses(literals):
+            if len(set(clause)) != len(clause):
+                # Repeated literals would break the two watches, keep the first occurrences
+                clause = list(dict.fromkeys(clause))
+            self.add_watched_clause(self.arena.add(clause))
+
+        if self.PBV_heuristic == "SurpriseMe":
+            self.PBV_heuristic = random.choice(["DLIS", "Lishuo", "Random", "VSIDS", "MOM", "JW"])
+        # NumPy scores computed from the clauses at each decision, which replace the counters below
+        self.vectorized_scores = vectorized_scoring.VectorizedScores(self.arena) if vectorized else None
+        # Occurrence counts for the counting heuristics, updated as the trail changes
+        self.literal_counters = None
+        if self.PBV_heuristic in LiteralCounters.HEURISTICS and not self.vectorized_scores:
+            self.literal_counters = LiteralCounters(self.assignments, self.arena,
+                                                    LiteralCounters.HEURISTICS[self.PBV_heuristic])
+
+    @classmethod
+    def from_clauses(cls, clauses, PBV_heuristic="DLIS", restart=False, preprocess=False):
+        """Build a solver for in-memory clauses, each an iterable of non-zero DIMACS literals"""
+        literals = array("i")
+        num_clauses = 0
+        for clause in clauses:
+            literals.extend(clause)
+            literals.append(0)
+            num_clauses += 1
+        num_variables = max(map(abs, literals), default=0)
+        return cls(None, PBV_heuristic, restart, formula=(literals, num_variables, num_clauses),
+                   preprocess=preprocess)
+
+    def add_variable(self, var):
+        """Make room for variable `var` in the per-variable arrays and let the search assign it"""
+        if var > self.num_variables:
+            grow = var - self.num_variables
+            # Extended in place, the heaps and literal counters share these lists
+            self.assignments.extend([UNDEFINED] * grow)
+            self.levels.extend([-1] * grow)
+            self.reasons.extend([None] * grow)
+            self.seen.extend([False] * grow)
+            self.vsid_activity.extend([0.0] * grow)
+            self.phases.extend([TRUE] * grow)
+            self.num_variables = var
+        if var not in self.atomic_prop:
+            self.atomic_prop.add(var)
+            self.input_variables.add(var)
+            # Drop the value extend_model gave to a variable removed by preprocessing
+            self.assignments[var] = UNDEFINED
+            self.vsid_heap.push(var)
+
+    def add_clause(self, literals):
+        """
+        Add a clause (non-zero DIMACS literals) to the formula between calls to solve().
+        The solver goes back to level 0, learnt clauses and activities are kept.
+        """
+        clause = list(dict.fromkeys(literals))
+        if any(-lit in clause for lit in clause):
+            return
+        if self.preprocessor and any(abs(lit) in self.preprocessor.eliminated for lit in clause):
+            raise ValueError("Clause uses a variable eliminated by preprocessing")
+        self.backtrack(0)
+        for lit in clause:
+            self.add_variable(abs(lit))
+        if self.input_literals is not None:
+            self.input_literals.extend(clause)
+            self.input_literals.append(0)
+        self.attach_clause(clause)
+
+    def attach_clause(self, clause, learnt=False, lbd=0):
+        """Store and watch a clause at level 0, assigning its literal if it is unit. Return its cref."""
+        # Literals false at level 0 stay false, watch the other ones
+        clause.sort(key=lambda l: self.literal_value(l) == FALSE)
+        cref = self.arena.add(clause, learnt=learnt, lbd=lbd)
+        self.add_watched_clause(cref)
+        if self.literal_counters:
+            self.literal_counters.on_learn(cref, clause)
+        if not clause or self.literal_value(clause[0]) == FALSE:
+            self.mark_inconsistent()
+        elif self.literal_value(clause[0]) == UNDEFINED and \
+                (len(clause) == 1 or self.literal_value(clause[1]) == FALSE):
+            self.assign_literal(clause[0], cref)
+        return cref
+
+    def solve(self, assumptions=()):
+        """
+        Search for a model in which every literal of `assumptions` is true. Return the model
+        as a dict - variable:int -> value, "UNSAT" or "UNKNOWN". On "UNSAT", self.core holds
+        the assumptions that cannot be true together (empty if the clauses alone are UNSAT).
+        On "UNKNOWN", a budget ran out or interrupt() was called, see stop_reason.
+        """
+        self.stop_reason = None
+        self.deadline = time.perf_counter() + self.max_time if self.max_time is not None else None
+        if self.max_memory is not None and memory_mb() is None:
+            self.memory_baseline = peak_memory_mb()
+        result = self.search(assumptions)
+        self.report_progress()
+        if self.checkpoint_path:
+            self.save_checkpoint(self.checkpoint_path)
+        return result
+
+    def search(self, assumptions):
+        self.backtrack(0)
+        self.core = []
+        for lit in assumptions:
+            if abs(lit) not in self.atomic_prop:
+                raise ValueError(f"Assumption {lit} is not on a variable of the formula")
+        self.assumptions = list(assumptions)
+        if self.inconsistent:
+            return "UNSAT"
 
-    def solve(self):
-        while not self.all_variable_assigned():
-            logging.info(f"Current decision level = {self.level}")
+        if not self.assert_unit_clauses():
+            self.mark_inconsistent()
+            return "UNSAT"
+
+        while True:
             conflict = self.unit_propagation()
-            if conflict:
+            if conflict is not None:
+                self.stats.num_conflicts += 1
+                if self.progress_interval and self.stats.num_conflicts % self.progress_interval == 0:
+                    self.report_progress()
+                if self.checkpoint_path and self.stats.num_conflicts % self.checkpoint_interval == 0:
+                    self.save_checkpoint(self.checkpoint_path)
                 backtrack_level, learnt_clause = self.conflict_analysis(conflict)
                 if backtrack_level < 0:
+                    self.mark_inconsistent()
                     return "UNSAT"
                 else:
-                    logging.info(f"Adding clause {learnt_clause}")
-                    self.learnt_clauses.add(learnt_clause)
                     # Update weights for VSID
                     self.update_vsid_activity(learnt_clause)
                     self.backtrack(backtrack_level)
-            elif self.all_variable_assigned():
+                    cref = self.assert_learnt_clause(learnt_clause)
+                    self.clause_increment /= self.clause_decay
+                    if self.restart_policy:
+                        self.restart_policy.on_conflict(self.arena.lbd(cref))
+                    if self.out_of_budget():
+                        return "UNKNOWN"
+            elif self.all_variable_assigned() and self.level >= len(self.assumptions):
                 break
             else:
-                if self.restart:
-                    # Perform restart if threshold is reached
-                    self.restart_counter += 1
-                    if self.restart_counter == self.restart_threshold:
-                        self.assignments = {lit: UNDEFINED for lit in self.atomic_prop}
-                        self.branching_var = set()
-                        self.guess_trail = {}
-                        self.propagation_trail = {}
-                        self.implication_graph = dict((v, Node(v, UNDEFINED)) for v in self.atomic_prop)
-                        self.vsid_activity = {lit: 0 for lit in self.atomic_prop}
-                        self.level = 0
-                        self.restart_threshold *= 1.1
-                        continue
+                if self.out_of_budget():
+                    return "UNKNOWN"
+
+                if self.reduce_interval and self.stats.num_conflicts >= self.next_reduce:
+                    self.reduce_learnt_clauses()
+                    self.reduce_interval += self.reduce_increment
+                    self.next_reduce = self.stats.num_conflicts + self.reduce_interval
+
+                if self.restart_policy and self.restart_policy.should_restart():
+                    self.stats.num_restarts += 1
+                    self.backtrack(self.restart_level())
+                    self.restart_policy.on_restart()
+                    continue
+
+                if self.level < len(self.assumptions):
+                    assumption = self.assumptions[self.level]
+                    if self.literal_value(assumption) == FALSE:
+                        self.core = self.analyze_final(assumption)
+                        return "UNSAT"
+                    # An assumption already true still gets its own (empty) decision level
+                    self.trail_lim.append(len(self.trail))
+                    if self.literal_value(assumption) == UNDEFINED:
+                        self.assign_literal(assumption, None)
+                    continue
 
                 x, v = self.pick_branching_var()
-                logging.info(f"Pick {x} = {v}")
-                self.level += 1
-                self.num_PBV_invocations += 1
-                self.assignments[x] = v
-                self.branching_var.add(x)
-                self.guess_trail[self.level] = x
-                self.propagation_trail[self.level] = deque()
-                self.update_graph(x)
-        return self.assignments
+                self.stats.num_decisions += 1
+                self.trail_lim.append(len(self.trail))
+                self.assign_literal(x if v == TRUE else -x, None)
+        if self.preprocessor:
+            self.extend_model()
+        return {var: self.assignments[var] for var in self.input_variables}
+
+    def interrupt(self):
+        """Make solve() return "UNKNOWN" at its next conflict or decision, may be called from another thread"""
+        self.interrupted = True
+
+    def out_of_budget(self):
+        """Check the budgets and interrupt(), set stop_reason and return True if the search has to stop"""
+        stats = self.stats
+        if self.interrupted:
+            self.interrupted = False
+            self.stop_reason = "interrupted"
+        elif self.max_conflicts is not None and stats.num_conflicts >= self.max_conflicts:
+            self.stop_reason = "conflicts"
+        elif self.max_decisions is not None and stats.num_decisions >= self.max_decisions:
+            self.stop_reason = "decisions"
+        elif self.max_propagations is not None and stats.num_propagations >= self.max_propagations:
+            self.stop_reason = "propagations"
+        else:
+            # The clock and the memory usage are only looked at every 64 checks
+            self.budget_countdown -= 1
+            if self.budget_countdown > 0:
+                return False
+            self.budget_countdown = 64
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                self.stop_reason = "time"
+            elif self.max_memory is not None and self.memory_used() >= self.max_memory:
+                self.stop_reason = "memory"
+            else:
+                return False
+        return True
+
+    def memory_used(self):
+        """Megabytes counted against max_memory"""
+        memory = memory_mb()
+        if memory is None:
+            # The peak never goes down, only its growth within this call counts
+            return peak_memory_mb() - self.memory_baseline
+        return memory
+
+    def assert_unit_clauses(self):
+        """Assign the clauses of length 1 at level 0, return False if one of them is false"""
+        for cref in self.unit_clauses:
+            clause = self.arena.literals(cref)
+            if not clause or self.literal_value(clause[0]) == FALSE:
+                return False
+            if self.literal_value(clause[0]) == UNDEFINED:
+                self.assign_literal(clause[0], cref)
+        return True
+
+    def mark_inconsistent(self):
+        """Remember that the clauses are UNSAT, which the proof ends with the empty clause"""
+        if self.proof and not self.inconsistent:
+            self.proof.add([])
+        self.inconsistent = True
+
+    def report_progress(self):
+        for callback in self.progress_callbacks:
+            callback(self.stats)
+
+    def enable_timers(self):
+        """Time the search phases into stats.phase_times by wrapping the methods running them"""
+        if self.stats.phase_times:
+            return
+        for phase, method in (("propagate", "unit_propagation"), ("analyze", "conflict_analysis"),
+                              ("backtrack", "backtrack"), ("decide", "pick_branching_var"),
+                              ("reduce", "reduce_learnt_clauses")):
+            setattr(self, method, self.stats.timed(phase, getattr(self, method)))
+
+    def enable_tracing(self, capacity=1 << 16):
+        """
+        Record the last `capacity` decisions, propagations, conflicts, learnt clauses and back
+        jumps in a my_tracer.Tracer by wrapping the methods making them, and return the tracer.
+        The search is left untouched until this is called.
+        """
+        if self.tracer:
+            return self.tracer
+        tracer = self.tracer = my_tracer.Tracer(capacity)
+        record = tracer.record
+        assign_literal = self.assign_literal
+        conflict_analysis = self.conflict_analysis
+        assert_learnt_clause = self.assert_learnt_clause
+        backtrack = self.backtrack
+
+        def traced_assign_literal(literal, cref):
+            if cref is None:
+                record(my_tracer.DECIDE, literal, self.level)
+            else:
+                record(my_tracer.PROPAGATE, literal, cref)
+            assign_literal(literal, cref)
+
+        def traced_conflict_analysis(conflict_clause):
+            record(my_tracer.CONFLICT, conflict_clause, self.level)
+            return conflict_analysis(conflict_clause)
+
+        def traced_assert_learnt_clause(learnt_clause):
+            cref = assert_learnt_clause(learnt_clause)
+            record(my_tracer.LEARN, cref, self.arena.lbd(cref))
+            return cref
+
+        def traced_backtrack(backtrack_level):
+            if self.level > backtrack_level:
+                record(my_tracer.BACKJUMP, self.level, backtrack_level)
+            backtrack(backtrack_level)
+
+        self.assign_literal = traced_assign_literal
+        self.conflict_analysis = traced_conflict_analysis
+        self.assert_learnt_clause = traced_assert_learnt_clause
+        self.backtrack = traced_backtrack
+        return tracer
+
+    def analyze_final(self, assumption):
+        """Return the assumptions, `assumption` included, that imply the negation of `assumption`"""
+        # Only assumptions have been decided so far
+        return [assumption] + self.implying_decisions([-assumption])
+
+    def implying_decisions(self, literals):
+        """
+        Return the decisions on the trail from which the assigned `literals` follow by unit
+        propagation, found by walking the trail back through the reasons
+        """
+        decisions = []
+        seen = self.seen
+        levels = self.levels
+        for lit in literals:
+            if levels[abs(lit)] > 0:
+                seen[abs(lit)] = True
+        for lit in reversed(self.trail[self.trail_lim[0]:] if self.trail_lim else []):
+            var = abs(lit)
+            if not seen[var]:
+                continue
+            seen[var] = False
+            reason = self.reasons[var]
+            if reason is None:
+                decisions.append(lit)
+            else:
+                for l in self.arena.literals(reason):
+                    if abs(l) != var and levels[abs(l)] > 0:
+                        seen[abs(l)] = True
+        return decisions
+
+    def iter_models(self, limit=None, project_on=None, decisions_only=False, assumptions=()):
+        """
+        Yield up to `limit` models (as returned by solve()) one at a time, blocking each model
+        with a clause before looking for the next one. The blocking clauses stay in the solver.
+        With `project_on` (variables of the formula), models are restricted to these variables
+        and told apart on them only. With `decisions_only`, the blocking clause negates the
+        decisions the model follows from instead of the whole model, when these decisions are
+        all on projected variables. Models are those of the input formula, preprocessing or not.
+        """
+        self.restore_eliminated()
+        variables = set(self.atomic_prop if project_on is None else project_on)
+        num_models = 0
+        while limit is None or num_models < limit:
+            model = self.solve(assumptions)
+            if model in ("UNSAT", "UNKNOWN"):
+                return
+            literals = [var if self.assignments[var] == TRUE else -var for var in variables]
+            blocking_clause = [-lit for lit in literals]
+            # The decisions only stand for the model when every projected variable was assigned
+            # by the search and follows from them
+            if decisions_only and all(self.levels[var] >= 0 for var in variables):
+                decisions = self.implying_decisions(literals)
+                if decisions and all(abs(lit) in variables for lit in decisions):
+                    blocking_clause = [-lit for lit in decisions]
+            num_models += 1
+            yield model if project_on is None else {var: model[var] for var in variables}
+            self.add_clause(blocking_clause)
+
+    def restore_eliminated(self):
+        """
+        Put back the clauses preprocessing removed with their variables, and let the search
+        assign every variable of the input formula. The formula is then equivalent to the input
+        one, not only equisatisfiable, so that its models can be enumerated.
+        """
+        if not self.preprocessor:
+            return
+        self.backtrack(0)
+        for var in self.input_variables:
+            self.add_variable(var)
+        for _, clause in self.preprocessor.elimination_stack:
+            self.attach_clause(list(clause))
+        self.preprocessor.elimination_stack = []
+        self.preprocessor.eliminated = set()
+
+    def count_models(self, limit=None, project_on=None):
+        """Count the models of the formula, projected on `project_on`, stopping at `limit`"""
+        return sum(1 for _ in self.iter_models(limit, project_on, decisions_only=True))
+
+    def make_checkpoint(self):
+        """Snapshot of the learnt clauses, VSIDS activities and phases, as a checkpoint.Checkpoint"""
+        original = self.clauses
+        learnt_literals = array("i")
+        learnt_lbds = array("i")
+        for cref in self.arena.clauses(learnt=True):
+            learnt_literals.extend(self.arena.literals(cref))
+            learnt_literals.append(0)
+            learnt_lbds.append(self.arena.lbd(cref))
+        phases = array("b", self.phases)
+        # Assigned variables are saved with their current value
+        for lit in self.trail:
+            phases[abs(lit)] = TRUE if lit > 0 else FALSE
+        return checkpoint.Checkpoint(len(original), checkpoint.formula_digest(original),
+                                     array("d", self.vsid_activity), self.vsid_increment, phases,
+                                     learnt_literals, learnt_lbds)
+
+    def save_checkpoint(self, filepath):
+        self.make_checkpoint().save(filepath)
+
+    def load_checkpoint(self, filepath):
+        """
+        Restore the activities and phases saved by save_checkpoint and import the learnt clauses.
+        When the original clauses of the checkpoint are a prefix of the ones of this solver (the
+        same formula, maybe with clauses added), every learnt clause still holds. Otherwise, to
+        warm-start on a modified formula, a learnt clause is only imported if unit propagation
+        refutes its negation, which also keeps a DRAT proof valid. Return the number imported.
+        """
+        saved = checkpoint.Checkpoint.load(filepath)
+        original = self.clauses
+        trusted = (not self.proof and len(original) >= saved.num_original and
+                   checkpoint.formula_digest(original[:saved.num_original]) == saved.digest)
+        self.backtrack(0)
+        for var in range(1, min(self.num_variables, saved.num_variables) + 1):
+            self.vsid_activity[var] = saved.activities[var]
+            self.phases[var] = saved.phases[var]
+        self.vsid_increment = saved.vsid_increment
+        self.vsid_heap = my_heap.Heap(self.vsid_activity, self.atomic_prop)
+
+        imported = 0
+        for clause, lbd in saved.learnt_clauses():
+            if self.inconsistent:
+                break
+            # Variables eliminated by preprocessing or gone from the formula
+            if any(abs(lit) not in self.atomic_prop for lit in clause):
+                continue
+            if not trusted and not self.is_implied(clause):
+                continue
+            if self.proof:
+                self.proof.add(clause)
+            cref = self.attach_clause(clause, learnt=True, lbd=lbd)
+            self.arena.activity[cref] = self.clause_increment
+            if len(clause) > 1:
+                self.learnt_db.append(cref)
+            imported += 1
+        return imported
+
+    def is_implied(self, clause):
+        """Check whether unit propagation at level 0 gives a conflict once every literal of `clause` is false"""
+        self.backtrack(0)
+        if not self.assert_unit_clauses() or self.unit_propagation() is not None:
+            self.mark_inconsistent()
+            return True
+        if any(self.literal_value(lit) == TRUE for lit in clause):
+            return True
+        self.trail_lim.append(len(self.trail))
+        for lit in clause:
+            if self.literal_value(lit) == UNDEFINED:
+                self.assign_literal(-lit, None)
+        conflict = self.unit_propagation()
+        self.backtrack(0)
+        return conflict is not None
+
+    def extend_model(self):
+        """Assign the variables removed by preprocessing so that the input formula is satisfied"""
+        model = {var: self.assignments[var] == TRUE for var in self.atomic_prop}
+        self.preprocessor.extend_model(model)
+        for var in self.input_variables - self.atomic_prop:
+            self.assignments[var] = TRUE if model.get(var, False) else FALSE
+
+    @property
+    def clauses(self):
+        """Literals of every original clause"""
+        return [tuple(clause) for clause in self.arena.iter_literals(learnt=False)]
+
+    @property
+    def learnt_clauses(self):
+        """Literals of every learnt clause still in the database"""
+        return [tuple(clause) for clause in self.arena.iter_literals(learnt=True)]
+
+    @property
+    def num_PBV_invocations(self):
+        """Number of pick branching var invocations, kept for callers predating SolverStats"""
+        return self.stats.num_decisions
+
+    @property
+    def level(self):
+        """Current decision level"""
+        return len(self.trail_lim)
+
+    @property
+    def guess_trail(self):
+        """dict - level:int -> variable guessed at that level"""
+        # A level is empty when it was opened for an assumption that was already true
+        ends = self.trail_lim[1:] + [len(self.trail)]
+        return {level: abs(self.trail[start])
+                for level, (start, end) in enumerate(zip(self.trail_lim, ends), 1) if start < end}
+
+    @property
+    def propagation_trail(self):
+        """dict - level:int -> literals:deque, unit propagations done at that level"""
+        ends = self.trail_lim[1:] + [len(self.trail)]
+        return {level: deque(self.trail[start + 1:end])
+                for level, (start, end) in enumerate(zip(self.trail_lim, ends), 1)}
+
+    @property
+    def branching_var(self):
+        """Set of variables that were guessed"""
+        return set(self.guess_trail.values())
+
+    @property
+    def implication_graph(self):
+        """dict - variable:int -> Node, a view of the trail as an implication graph"""
+        return dict((v, Node(self, v)) for v in self.atomic_prop)
 
     def unit_propagation(self):
-        """Perform unit propagation and return conflict if conflict is found"""
-        while True:
-            # A list of clauses that we will propagate in this iteration
-            clauses_to_propagate = []
-            for clause in self.clauses.union(self.learnt_clauses):
-                clause_value = self.clause_value(clause)
-                # Check if conflict is found, return the clause that caused the conflict
-                if clause_value == FALSE:
-                    logging.debug(f"Found conflict at {clause}")
-                    return clause
-                if clause_value == UNDEFINED:
-                    is_unit_clause, unit_literal = self.is_unit_clause(clause)
-                    if is_unit_clause and (unit_literal, clause) not in clauses_to_propagate:
-                        clauses_to_propagate.append((unit_literal, clause))
-
-            # If nothing to propagate, return None to signal no conflict
-            if not clauses_to_propagate:
-                return None
-
-            for unit_literal, clause in reversed(clauses_to_propagate):
-                # Assign value so that the literal is true
-                logging.debug(f"Unit propagation: {unit_literal} in {clause}")
-                if unit_literal > 0:
-                    self.assignments[abs(unit_literal)] = TRUE
+        """Perform unit propagation and return the cref of the conflict clause if conflict is found"""
+        assignments = self.assignments
+        trail = self.trail
+        data = self.arena.data
+        header = clause_arena.HEADER
+        stats = self.stats
+        while self.propagation_head < len(trail):
+            false_literal = -trail[self.propagation_head]
+            self.propagation_head += 1
+            stats.num_propagations += 1
+            watchers = self.watches.get(false_literal)
+            if not watchers:
+                continue
+
+            # Walk the clauses watching the falsified literal, compacting the watch list in place
+            i = j = 0
+            num_watchers = len(watchers)
+            while i < num_watchers:
+                cref = watchers[i]
+                i += 1
+                first = cref + header
+                # Keep the falsified watch second
+                if data[first] == false_literal:
+                    data[first] = data[first + 1]
+                    data[first + 1] = false_literal
+                other = data[first]
+                other_value = assignments[abs(other)]
+                if other_value != UNDEFINED and (other_value == TRUE) == (other > 0):
+                    # Clause is already satisfied by the other watch
+                    watchers[j] = cref
+                    j += 1
+                    continue
+
+                # Look for a literal that is not false to watch instead
+                for k in range(first + 2, first + data[cref]):
+                    lit = data[k]
+                    value = assignments[abs(lit)]
+                    if value == UNDEFINED or (value == TRUE) == (lit > 0):
+                        data[first + 1] = lit
+                        data[k] = false_literal
+                        self.watches.setdefault(lit, []).append(cref)
+                        break
                 else:
-                    self.assignments[abs(unit_literal)] = FALSE
-                self.update_graph(abs(unit_literal), clause)
-                # Add propagation trail if level > 0, we don't care if unit prop happened in level 0
-                if self.level > 0:
-                    self.propagation_trail[self.level].append(unit_literal)
+                    watchers[j] = cref
+                    j += 1
+                    if other_value != UNDEFINED:
+                        # Every literal is false, keep the remaining watchers and report conflict
+                        watchers[j:] = watchers[i:num_watchers]
+                        self.propagation_head = len(trail)
+                        return cref
+                    self.assign_literal(other, cref)
+            del watchers[j:]
+        return None
+
+    def assign_literal(self, literal, cref):
+        """Make `literal` true because of clause `cref` (None for a guess) and push it on the trail"""
+        var = abs(literal)
+        self.assignments[var] = TRUE if literal > 0 else FALSE
+        self.levels[var] = len(self.trail_lim)
+        self.reasons[var] = cref
+        self.trail.append(literal)
+        if self.literal_counters:
+            self.literal_counters.on_assign(literal)
+
+    def add_watched_clause(self, cref):
+        """Register a clause in the watch lists, watching its first two literals"""
+        if self.arena.size(cref) < 2:
+            self.unit_clauses.append(cref)
+            return
+        first = cref + clause_arena.HEADER
+        self.watches.setdefault(self.arena.data[first], []).append(cref)
+        self.watches.setdefault(self.arena.data[first + 1], []).append(cref)
+
+    def assert_learnt_clause(self, learnt_clause):
+        """
+        Store and watch a learnt clause after back jumping and propagate its only unassigned
+        literal. The second watch is the literal assigned at the highest level so that the
+        watches stay valid when backtracking further. Return the cref of the clause.
+        """
+        clause = sorted(learnt_clause, key=lambda l: self.levels[abs(l)]
+                        if self.assignments[abs(l)] != UNDEFINED else self.level + 1, reverse=True)
+        # Literal block distance: the number of distinct levels, the asserting literal counting for one
+        lbd = len(set(self.levels[abs(lit)] for lit in clause[1:])) + 1
+        cref = self.arena.add(clause, learnt=True, lbd=lbd)
+        self.stats.on_learn(len(clause), lbd)
+        if self.proof:
+            self.proof.add(clause)
+        self.arena.activity[cref] = self.clause_increment
+        self.add_watched_clause(cref)
+        if len(clause) > 1:
+            self.learnt_db.append(cref)
+        if self.literal_counters:
+            self.literal_counters.on_learn(cref, clause)
+        self.assign_literal(clause[0], cref)
+        return cref
+
+    def restart_level(self):
+        """
+        Level to backtrack to on restart. Assignments at level 0 are implied by the formula.
+        With VSIDS, a level whose guess is more active than the variable that would be guessed
+        next would be guessed again right away, so those levels are kept.
+        """
+        if not self.reuse_trail or self.PBV_heuristic != "VSIDS":
+            return 0
+        # The assumption levels would be decided again in the same order
+        level = min(len(self.assumptions), self.level)
+        heap = self.vsid_heap
+        while heap and self.assignments[heap.top()] != UNDEFINED:
+            heap.pop()
+        if not heap:
+            return level
+        next_activity = self.vsid_activity[heap.top()]
+        while level < self.level and self.vsid_activity[abs(self.trail[self.trail_lim[level]])] > next_activity:
+            level += 1
+        return level
+
+    def is_locked(self, cref):
+        """Check if a clause is the reason of a current assignment"""
+        return self.reasons[abs(self.arena.data[cref + clause_arena.HEADER])] == cref
+
+    def bump_clause_activity(self, cref):
+        """Increase the activity of a learnt clause used in conflict analysis"""
+        activity = self.arena.activity
+        activity[cref] += self.clause_increment
+        if activity[cref] > self.clause_rescale_limit:
+            for c in activity:
+                activity[c] /= self.clause_rescale_limit
+            self.clause_increment /= self.clause_rescale_limit
+
+    def reduce_learnt_clauses(self):
+        """Delete the worst half of the learnt clauses that are neither glue clauses nor locked"""
+        arena = self.arena
+        candidates = [c for c in self.learnt_db if arena.lbd(c) > 2 and not self.is_locked(c)]
+        # Worst first: highest LBD, then lowest activity
+        candidates.sort(key=lambda c: (-arena.lbd(c), arena.activity[c]))
+        for cref in candidates[:len(candidates) // 2]:
+            if self.literal_counters:
+                self.literal_counters.on_forget(cref, arena.literals(cref))
+            if self.proof:
+                self.proof.delete(arena.literals(cref))
+            arena.delete(cref)
+            self.stats.num_learnt_deleted += 1
+        self.learnt_db = [c for c in self.learnt_db if not arena.is_deleted(c)]
+        for watchers in self.watches.values():
+            watchers[:] = [c for c in watchers if not arena.is_deleted(c)]
+        self.stats.num_reductions += 1
+        self.stats.num_learnt_kept = len(self.learnt_db)
+        logging.info("Reduced learnt clauses: kept %s, deleted %s",
+                     self.stats.num_learnt_kept, self.stats.num_learnt_deleted)
+        if arena.wasted > len(arena.data) // 4:
+            self.collect_garbage()
+
+    def collect_garbage(self):
+        """Compact the clause arena and relocate every cref held by the solver"""
+        relocation = self.arena.garbage_collect()
+        for watchers in self.watches.values():
+            watchers[:] = [relocation[c] for c in watchers]
+        for lit in self.trail:
+            reason = self.reasons[abs(lit)]
+            if reason is not None:
+                self.reasons[abs(lit)] = relocation[reason]
+        self.learnt_db = [relocation[c] for c in self.learnt_db]
+        self.unit_clauses = [relocation[c] for c in self.unit_clauses]
+        if self.literal_counters:
+            self.literal_counters.on_relocate(relocation)
 
     def all_variable_assigned(self):
         """Returns true if all variables have assignment"""
-        all_assigned = all(var in self.assignments for var in self.atomic_prop)
-        none_unassigned = not any(var for var in self.atomic_prop if self.assignments[var] == UNDEFINED)
-        return all_assigned and none_unassigned
+        # Only variables of the formula are ever assigned, so the trail holds each of them once
+        return len(self.trail) == len(self.atomic_prop)
 
     def pick_branching_var(self):
         """Pick a variable to branch"""
 
-        if self.PBV_heuristic == "SurpriseMe":
-            self.PBV_heuristic = random.choice(["DLIS", "Lishuo", "Random", "VSIDS", "MOM", "JW"])
-            return self.pick_branching_var()
-
         if self.PBV_heuristic == "BigBang":
             heuristics = ["DLIS", "MOM", "JW"]
             all_var = []
@@ -146,20 +820,22 @@ class CDCLSolver:
             best_assign = max(set(best_var_assign), key=best_var_assign.count)
             return best_var, best_assign
 
+        if self.vectorized_scores and self.PBV_heuristic in vectorized_scoring.HEURISTICS:
+            return self.vectorized_scores.pick(self.PBV_heuristic, self.assignments)
+
         if self.PBV_heuristic == "DLIS":
-            variables = self.count_unassigned_literals(self.clauses.union(self.learnt_clauses))
-            variable = max(variables.items(), key=operator.itemgetter(1))[0]
+            variable = self.literal_counters.best_literal()
             assign = TRUE if variable > 0 else FALSE
             return abs(variable), assign
 
         if self.PBV_heuristic == "Lishuo":
             variables = {}
             variables2 = {}
-            unassigned = list(self.all_unassigned_vars())
-            two_clause = set()
-            for clause in self.clauses.union(self.learnt_clauses):
+            unassigned = set(self.all_unassigned_vars())
+            two_clause = []
+            for clause in self.arena.iter_literals():
                 if self.check_two_clause(clause):
-                    two_clause.add(clause)
+                    two_clause.append(clause)
                 for lit in clause:
                     if abs(lit) not in unassigned:
                         continue
@@ -170,7 +846,6 @@ class CDCLSolver:
                         variables[lit] = 1
                         variables2[lit] = 1
 
-            # two_clause = set(filter(lambda x: self.check_two_clause(x), self.clauses.union(self.learnt_clauses)))
             for clause in two_clause:
                 unassigned_lits = self.get_unassigned_literals_in_clause(clause)
                 if -unassigned_lits[0] in variables2 and unassigned_lits[1] in variables:
@@ -186,11 +861,11 @@ class CDCLSolver:
 
             variables = {}
             variables2 = {}
-            unassigned = list(self.all_unassigned_vars())
-            two_clause = set()
-            for clause in self.clauses.union(self.learnt_clauses):
+            unassigned = set(self.all_unassigned_vars())
+            two_clause = []
+            for clause in self.arena.iter_literals():
                 if self.check_two_clause(clause):
-                    two_clause.add(clause)
+                    two_clause.append(clause)
                 for lit in clause:
                     if abs(lit) not in unassigned:
                         continue
@@ -229,26 +904,21 @@ class CDCLSolver:
             return abs(variable), assign
 
         if self.PBV_heuristic == "RDLIS":
-            variables = self.count_unassigned_literals(self.clauses.union(self.learnt_clauses))
             # Randomly choose if there are more than 1 maximum value
-            max_val = max(variables.items(), key=operator.itemgetter(1))[1]
-            variable = random.choice(list(filter(lambda elem: elem[1] == max_val, variables.items())))[0]
+            variable = random.choice(self.literal_counters.best_literals())
             assign = TRUE if variable > 0 else FALSE
             return abs(variable), assign
 
         if self.PBV_heuristic == "DLCS":
-            variables = self.count_unassigned_literals(self.clauses.union(self.learnt_clauses))
-            variables2 = self.count_unassigned_literals(self.clauses.union(self.learnt_clauses), False)
-            variable = max(variables2.items(), key=operator.itemgetter(1))[0]
-            assign = TRUE if variables.get(variable, 0) > variables.get(-variable, 0) else FALSE
+            variables = self.literal_counters.occurrences
+            variable = self.literal_counters.best_variable()
+            assign = TRUE if variables[variable] > variables[-variable] else FALSE
             return variable, assign
 
         if self.PBV_heuristic == "RDLCS":
-            variables = self.count_unassigned_literals(self.clauses.union(self.learnt_clauses))
-            variables2 = self.count_unassigned_literals(self.clauses.union(self.learnt_clauses), False)
-            max_val = max(variables2.items(), key=operator.itemgetter(1))[1]
-            variable = random.choice(list(filter(lambda elem: elem[1] == max_val, variables2.items())))[0]
-            assign = TRUE if variables.get(variable, 0) > variables.get(-variable, 0) else FALSE
+            variables = self.literal_counters.occurrences
+            variable = random.choice(self.literal_counters.best_variables())
+            assign = TRUE if variables[variable] > variables[-variable] else FALSE
             return variable, assign
 
         if self.PBV_heuristic == "Random":
@@ -259,7 +929,7 @@ class CDCLSolver:
 
         if self.PBV_heuristic == "2-Clause":
             variables = self.count_unassigned_literals(
-                list(filter(lambda x: self.check_two_clause(x), self.clauses.union(self.learnt_clauses))), False)
+                list(filter(lambda x: self.check_two_clause(x), self.arena.iter_literals())), False)
             if len(variables) != 0:
                 max_val = max(variables.items(), key=operator.itemgetter(1))[1]
                 variable = random.choice(list(filter(lambda elem: elem[1] == max_val, variables.items())))[0]
@@ -269,22 +939,12 @@ class CDCLSolver:
             return abs(variable), assign
 
         if self.PBV_heuristic == "JW":
-            variables = {}
-            unassigned = list(self.all_unassigned_vars())
-            for clause in self.clauses.union(self.learnt_clauses):
-                for lit in clause:
-                    if abs(lit) not in unassigned:
-                        continue
-                    if lit in variables:
-                        variables[lit] += math.pow(2, -len(clause))
-                    else:
-                        variables[lit] = math.pow(2, -len(clause))
-            variable = max(variables.items(), key=operator.itemgetter(1))[0]
+            variable = self.literal_counters.best_jw_literal()
             assign = TRUE if variable > 0 else FALSE
             return abs(variable), assign
 
         if self.PBV_heuristic == "MOM":
-            variables = self.count_unassigned_literals(self.get_unresolved_smallest_clauses())
+            variables = self.literal_counters.smallest_unresolved_counts()
             scores = {}
             k = 2
             for lit, score in variables.items():
@@ -296,53 +956,100 @@ class CDCLSolver:
             return abs(variable), assign
 
         if self.PBV_heuristic == "VSIDS":
-            unassigned = list(self.all_unassigned_vars())
-            variable = 0
-            for lit in unassigned:
-                if variable == 0 or self.vsid_activity[variable] < self.vsid_activity[lit]:
-                    variable = lit
-            assign = TRUE if variable > 0 else FALSE
-            return variable, assign
+            # Assigned variables are removed lazily from the heap
+            variable = self.vsid_heap.pop()
+            while self.assignments[variable] != UNDEFINED:
+                variable = self.vsid_heap.pop()
+            return variable, self.phases[variable]
 
     def conflict_analysis(self, conflict_clause):
-        """Perform conflict analysis and return the level to back jump to and learnt clause"""
-        logging.info(f"Performing conflict analysis on clause {conflict_clause} at {self.level}")
-
+        """
+        Perform conflict analysis on the clause `conflict_clause` (a cref) and return the level
+        to back jump to and the learnt clause, as a list starting with the asserting literal
+        """
         # If conflict is found at level 0, UNSAT
         if self.level == 0:
             return -1, None
 
-        assign_history = [self.guess_trail[self.level]] + list(self.propagation_trail[self.level])
-        logging.info(f"assign history for level {self.level} = {assign_history}")
-
-        lits = conflict_clause
-        done = set()
-        previous_level = set()
-        current_level = set()
-
+        arena = self.arena
+        levels = self.levels
+        seen = self.seen
+        trail = self.trail
+        learnt = [None]  # index 0 is reserved for the first UIP
+        counter = 0  # number of literals of the current level not resolved yet
+        index = len(trail)
+        clause = conflict_clause
+        last_assigned = 0
+
+        # Resolve the literals of the current level away in reverse trail order, until only
+        # one is left (the first unique implication point)
         while True:
-            logging.info('-------')
-            logging.info('pool lits: %s', lits)
-            for lit in lits:
-                if self.implication_graph[abs(lit)].level == self.level:
-                    current_level.add(lit)
-                else:
-                    previous_level.add(lit)
-            if len(current_level) == 1:
+            if arena.is_learnt(clause):
+                self.bump_clause_activity(clause)
+            for lit in arena.literals(clause):
+                var = abs(lit)
+                # Literals false at level 0 are false in every model and can be dropped
+                if not seen[var] and levels[var] > 0 and lit != last_assigned:
+                    seen[var] = True
+                    if levels[var] == self.level:
+                        counter += 1
+                    else:
+                        learnt.append(lit)
+            index -= 1
+            while not seen[abs(trail[index])]:
+                index -= 1
+            last_assigned = trail[index]
+            seen[abs(last_assigned)] = False
+            counter -= 1
+            if counter == 0:
                 break
-            last_assigned, others = self.next_recent_assigned(current_level, assign_history)
-            done.add(abs(last_assigned))
-            current_level = set(others)
-            pool_clause = self.implication_graph[abs(last_assigned)].clause
-            lits = [l for l in pool_clause if abs(l) not in done] if pool_clause is not None else []
-
-        learnt = frozenset([l for l in current_level.union(previous_level)])
-        if previous_level:
-            level = max([self.implication_graph[abs(x)].level for x in previous_level])
+            clause = self.reasons[abs(last_assigned)]
+        learnt[0] = -last_assigned
+
+        # Drop the literals implied by the other literals of the learnt clause
+        to_clear = learnt[1:]
+        abstract_levels = 0
+        for lit in learnt[1:]:
+            abstract_levels |= 1 << (levels[abs(lit)] & 31)
+        minimized = [learnt[0]] + [lit for lit in learnt[1:]
+                                   if not self.is_redundant(lit, abstract_levels, to_clear)]
+        for lit in to_clear:
+            seen[abs(lit)] = False
+
+        if len(minimized) > 1:
+            level = max([levels[abs(x)] for x in minimized[1:]])
         else:
-            level = self.level - 1
+            # A unit learnt clause holds regardless of any guess
+            level = 0
 
-        return level, learnt
+        return level, minimized
+
+    def is_redundant(self, literal, abstract_levels, to_clear):
+        """
+        Check whether a literal of the learnt clause is implied by the others, that is
+        whether every path from its reason leads back to a literal already in the clause.
+        `abstract_levels` is a bitmask of the levels in the learnt clause for early exits.
+        """
+        if self.reasons[abs(literal)] is None:
+            return False
+        seen = self.seen
+        levels = self.levels
+        stack = [literal]
+        top = len(to_clear)
+        while stack:
+            for lit in self.arena.literals(self.reasons[abs(stack.pop())]):
+                var = abs(lit)
+                if not seen[var] and levels[var] > 0:
+                    if self.reasons[var] is not None and (1 << (levels[var] & 31)) & abstract_levels:
+                        seen[var] = True
+                        stack.append(lit)
+                        to_clear.append(lit)
+                    else:
+                        for l in to_clear[top:]:
+                            seen[abs(l)] = False
+                        del to_clear[top:]
+                        return False
+        return True
 
     def find_dependencies(self, clause, level):
         """Find dependency of a variable"""
@@ -352,7 +1059,7 @@ class CDCLSolver:
         for literal in self.propagation_trail.get(level, []):
             if -literal in clause:
                 dependencies.append(literal)
-        logging.debug(f"Found {len(dependencies)} dependencies for {clause}: {dependencies} at level {level}")
+        logging.debug("Found %s dependencies for %s: %s at level %s", len(dependencies), clause, dependencies, level)
         return dependencies
 
     def backtrack(self, backtrack_level):
@@ -360,46 +1067,22 @@ class CDCLSolver:
         Non-chronologically backtrack ("back jump") to the appropriate decision level,
         where the first-assigned variable involved in the conflict was assigned
         """
-        logging.debug('backtracking to %s', backtrack_level)
-        # Update implication graph
-        for var, node in self.implication_graph.items():
-            if node.level <= backtrack_level:
-                # If keep node, remove all children with decision level higher than backtrack level
-                node.children = list(filter(lambda child: child.level <= backtrack_level, node.children))
-            else:
-                # Else remove node entirely
-                node.value = UNDEFINED
-                node.level = -1
-                node.parents = []
-                node.children = []
-                node.clause = None
-                self.assignments[node.variable] = UNDEFINED
-
-        # Remove branching variable list according to implication graph
-        self.branching_var = set(filter(lambda v: self.assignments[v] != UNDEFINED, self.branching_var))
-
-        # Remove guess trail and propagation trail
-        for k in list(self.propagation_trail.keys()):
-            if k > backtrack_level:
-                del self.guess_trail[k]
-                del self.propagation_trail[k]
-
-        self.level = backtrack_level
-        logging.info('after backtracking, graph:\n%s', self.implication_graph)
-
-    def update_graph(self, var, clause=None):
-        """Update the implication graph for a variable, update literals in implication clause if needed"""
-        node = self.implication_graph[var]
-        node.value = self.assignments[var]
-        node.level = self.level
-        node.clause = clause
-
-        # update reason for propagation (parent-child links in implication graph) if needed
-        if clause:
-            for v in [abs(lit) for lit in clause if abs(lit) != var]:
-                node.parents.append(self.implication_graph[v])
-                self.implication_graph[v].children.append(node)
-            logging.info(f'Updated node {var} with parents: {node.parents}')
+        if self.level > backtrack_level:
+            # Only the assignments made after the backtrack level are undone
+            start = self.trail_lim[backtrack_level]
+            for lit in self.trail[start:]:
+                var = abs(lit)
+                self.phases[var] = TRUE if lit > 0 else FALSE
+                self.assignments[var] = UNDEFINED
+                self.levels[var] = -1
+                self.reasons[var] = None
+                self.vsid_heap.push(var)
+                if self.literal_counters:
+                    self.literal_counters.on_unassign(lit)
+            del self.trail[start:]
+            del self.trail_lim[backtrack_level:]
+        # Literals kept on the trail were propagated, except maybe the last ones at level 0
+        self.propagation_head = min(self.propagation_head, len(self.trail))
 
     @staticmethod
     def resolution(c1, c2, prop=None):
@@ -490,23 +1173,11 @@ class CDCLSolver:
 
     def complete_assignment(self):
         """Check if we have a complete assignment so we can stop"""
-        for assignment in self.assignments.values():
-            if assignment == UNDEFINED:
-                return False
-        return True
-
-    def next_recent_assigned(self, clause, assign_history):
-        """
-        According to the assign history, separate the latest assigned variable
-        with the rest in `clause`
-        """
-        for v in reversed(assign_history):
-            if v in clause or -v in clause:
-                return v, [x for x in clause if abs(x) != abs(v)]
+        return self.all_variable_assigned()
 
     def all_unassigned_vars(self):
         """Get all unassigned variables from all atomic propositions"""
-        return filter(lambda v: v in self.assignments and self.assignments[v] == UNDEFINED, self.atomic_prop)
+        return filter(lambda v: self.assignments[v] == UNDEFINED, self.atomic_prop)
 
     def check_two_clause(self, clause):
         """Check if a clause is a 2-clause"""
@@ -515,12 +1186,14 @@ class CDCLSolver:
 
     def checkSAT(self):
         """Verify that the current assignment is satisfiable (value is 1)"""
+        if self.input_literals is not None:
+            return self.formula_value(my_parser.iter_clauses(self.input_literals))
         return self.formula_value(self.clauses)
 
     def count_unassigned_literals(self, clauses, polarity=True):
         """Count the unassigned literals in all clauses"""
         variables = {}
-        unassigned = list(self.all_unassigned_vars())
+        unassigned = set(self.all_unassigned_vars())
         for clause in clauses:
             for lit in clause:
                 if abs(lit) not in unassigned:
@@ -537,39 +1210,20 @@ class CDCLSolver:
                         variables[abs(lit)] = 1
         return variables
 
-    def get_unresolved_smallest_clauses(self):
-        """Get unresolved smallest clause"""
-        smallest_clause_size = -1
-        for clause in self.clauses.union(self.learnt_clauses):
-            if self.clause_value(clause) != UNDEFINED:
-                continue
-            if smallest_clause_size == -1 or smallest_clause_size > len(clause):
-                smallest_clause_size = len(clause)
-
-        # If all clauses are satisfied, just return all clauses
-        if smallest_clause_size == -1:
-            return self.clauses
-
-        # Else return a list of k-clauses with the least k
-        smallest_clauses = set()
-        for clause in self.clauses.union(self.learnt_clauses):
-            if self.clause_value(clause) != UNDEFINED:
-                continue
-            if len(clause) == smallest_clause_size:
-                smallest_clauses.add(clause)
-
-        return smallest_clauses
-
     def update_vsid_activity(self, learnt_clause):
         """Update VSID counter"""
-        if self.PBV_heuristic != "VSID":
-            pass
-
-        # Increment activity and apply decay
+        activity = self.vsid_activity
         for lit in learnt_clause:
-            self.vsid_activity[abs(lit)] += 1
-        for lit in self.atomic_prop:
-            self.vsid_activity[abs(lit)] *= self.vsid_decay
+            var = abs(lit)
+            activity[var] += self.vsid_increment
+            self.vsid_heap.update(var)
+            if activity[var] > self.vsid_rescale_limit:
+                # Scaling every activity by the same factor keeps the heap order
+                for v in range(len(activity)):
+                    activity[v] /= self.vsid_rescale_limit
+                self.vsid_increment /= self.vsid_rescale_limit
+        # Growing the increment has the same effect as decaying all other activities
+        self.vsid_increment /= self.vsid_decay
 
     def get_unassigned_literals_in_clause(self, clause):
         lits = []
@@ -580,14 +1234,247 @@ class CDCLSolver:
 
 
 class Node:
+    """A view of one variable of the implication graph, backed by the solver's trail arrays"""
 
-    def __init__(self, variable, value):
+    def __init__(self, solver, variable):
+        self.solver = solver
         self.variable = variable
-        self.value = value
-        self.level = -1
-        self.parents = []
-        self.children = []
-        self.clause = None      # The clause that caused unit prop
+
+    @property
+    def value(self):
+        return self.solver.assignments[self.variable]
+
+    @property
+    def level(self):
+        return self.solver.levels[self.variable]
+
+    @property
+    def clause(self):
+        """The clause that caused unit prop"""
+        reason = self.solver.reasons[self.variable]
+        return None if reason is None else tuple(self.solver.arena.literals(reason))
+
+    @property
+    def parents(self):
+        if self.clause is None:
+            return []
+        return [Node(self.solver, abs(lit)) for lit in self.clause if abs(lit) != self.variable]
+
+    @property
+    def children(self):
+        children = []
+        for lit in self.solver.trail:
+            reason = self.solver.reasons[abs(lit)]
+            if reason is not None and abs(lit) != self.variable and \
+                    any(abs(l) == self.variable for l in self.solver.arena.literals(reason)):
+                children.append(Node(self.solver, abs(lit)))
+        return children
+
+
+class LiteralCounters:
+    """
+    Clause statistics used by the counting heuristics, kept up to date through the
+    on_assign / on_unassign / on_learn hooks instead of being recounted on every decision.
+    Like the heuristics always did, occurrences are counted over all clauses and the
+    heuristic only considers literals of unassigned variables.
+    """
+
+    # Which statistics each heuristic needs
+    HEURISTICS = {
+        "DLIS": {"DLIS"}, "RDLIS": {"DLIS"},
+        "DLCS": {"DLCS"}, "RDLCS": {"DLCS"},
+        "JW": {"JW"},
+        "MOM": {"MOM"},
+        "BigBang": {"DLIS", "JW", "MOM"},
+    }
+
+    def __init__(self, assignments, arena, statistics):
+        self.assignments = assignments
+        self.occurrences = defaultdict(int)  # dict - literal:int -> number of clauses containing it
+        self.variable_occurrences = defaultdict(int)  # dict - variable:int -> occurrences of both literals
+        self.jw_weights = defaultdict(float)  # dict - literal:int -> Jeroslow-Wang weight
+
+        # Max-heaps for the lookups, assigned entries are dropped lazily and pushed back on unassign
+        self.literal_heap = my_heap.Heap(self.occurrences) if "DLIS" in statistics else None
+        self.variable_heap = my_heap.Heap(self.variable_occurrences) if "DLCS" in statistics else None
+        self.jw_heap = my_heap.Heap(self.jw_weights) if "JW" in statistics else None
+
+        # For MOM, clauses that are not satisfied yet are bucketed by size with per-literal counts
+        self.track_unresolved = "MOM" in statistics
+        self.clause_literals = []  # list - clause id -> literals
+        self.num_true = []  # list - clause id -> number of true literals in the clause
+        self.occurrence_lists = defaultdict(list)  # dict - literal:int -> ids of clauses containing it
+        self.clause_ids = {}  # dict - cref:int -> clause id
+        self.unresolved = defaultdict(set)  # dict - size:int -> ids of clauses with no true literal
+        self.unresolved_counts = defaultdict(lambda: defaultdict(int))  # size -> literal -> count
+
+        for cref in arena.clauses():
+            self.on_learn(cref, arena.literals(cref))
+
+    def on_learn(self, cref, clause):
+        """Add clause `cref` with literals `clause` to the statistics"""
+        for lit in clause:
+            self.occurrences[lit] += 1
+            self.variable_occurrences[abs(lit)] += 1
+            self.jw_weights[lit] += math.pow(2, -len(clause))
+            if self.literal_heap is not None:
+                self.literal_heap.push(lit)
+                self.literal_heap.update(lit)
+            if self.variable_heap is not None:
+                self.variable_heap.push(abs(lit))
+                self.variable_heap.update(abs(lit))
+            if self.jw_heap is not None:
+                self.jw_heap.push(lit)
+                self.jw_heap.update(lit)
+
+        if self.track_unresolved:
+            clause_id = len(self.clause_literals)
+            self.clause_ids[cref] = clause_id
+            self.clause_literals.append(tuple(clause))
+            num_true = 0
+            for lit in clause:
+                self.occurrence_lists[lit].append(clause_id)
+                value = self.assignments[abs(lit)]
+                if value != UNDEFINED and (value == TRUE) == (lit > 0):
+                    num_true += 1
+            self.num_true.append(num_true)
+            if num_true == 0:
+                self.mark_unresolved(clause_id)
+
+    def on_forget(self, cref, clause):
+        """Remove deleted clause `cref` with literals `clause` from the statistics"""
+        for lit in clause:
+            self.occurrences[lit] -= 1
+            self.variable_occurrences[abs(lit)] -= 1
+            self.jw_weights[lit] -= math.pow(2, -len(clause))
+            for heap, item in ((self.literal_heap, lit), (self.variable_heap, abs(lit)), (self.jw_heap, lit)):
+                if heap is not None:
+                    heap.update(item)
+
+        if self.track_unresolved:
+            clause_id = self.clause_ids.pop(cref)
+            if self.num_true[clause_id] == 0:
+                self.mark_resolved(clause_id)
+            for lit in clause:
+                self.occurrence_lists[lit].remove(clause_id)
+            self.clause_literals[clause_id] = None
+
+    def on_relocate(self, relocation):
+        """Follow the clauses moved by a garbage collection of the clause arena"""
+        if self.track_unresolved:
+            self.clause_ids = {relocation[cref]: clause_id for cref, clause_id in self.clause_ids.items()}
+
+    def on_assign(self, literal):
+        """Update the statistics after `literal` became true"""
+        if not self.track_unresolved:
+            return
+        num_true = self.num_true
+        for clause_id in self.occurrence_lists[literal]:
+            num_true[clause_id] += 1
+            if num_true[clause_id] == 1:
+                self.mark_resolved(clause_id)
+
+    def on_unassign(self, literal):
+        """Update the statistics after `literal` (which was true) became unassigned"""
+        var = abs(literal)
+        if self.literal_heap is not None:
+            for lit in (var, -var):
+                if self.occurrences[lit]:
+                    self.literal_heap.push(lit)
+        if self.variable_heap is not None:
+            self.variable_heap.push(var)
+        if self.jw_heap is not None:
+            for lit in (var, -var):
+                if self.occurrences[lit]:
+                    self.jw_heap.push(lit)
+        if self.track_unresolved:
+            num_true = self.num_true
+            for clause_id in self.occurrence_lists[literal]:
+                num_true[clause_id] -= 1
+                if num_true[clause_id] == 0:
+                    self.mark_unresolved(clause_id)
+
+    def mark_unresolved(self, clause_id):
+        clause = self.clause_literals[clause_id]
+        self.unresolved[len(clause)].add(clause_id)
+        counts = self.unresolved_counts[len(clause)]
+        for lit in clause:
+            counts[lit] += 1
+
+    def mark_resolved(self, clause_id):
+        clause = self.clause_literals[clause_id]
+        self.unresolved[len(clause)].discard(clause_id)
+        counts = self.unresolved_counts[len(clause)]
+        for lit in clause:
+            counts[lit] -= 1
+
+    def top_unassigned(self, heap):
+        """Drop assigned entries from the top of `heap` and return the best remaining one"""
+        while self.assignments[abs(heap.top())] != UNDEFINED:
+            heap.pop()
+        return heap.top()
+
+    def top_unassigned_ties(self, heap):
+        """Return every unassigned entry of `heap` sharing the best score"""
+        best_score = heap.scores[self.top_unassigned(heap)]
+        ties = []
+        while heap and heap.scores[heap.top()] == best_score:
+            item = heap.pop()
+            if self.assignments[abs(item)] == UNDEFINED:
+                ties.append(item)
+        for item in ties:
+            heap.push(item)
+        return ties
+
+    def best_literal(self):
+        """Unassigned literal appearing in the most clauses"""
+        return self.top_unassigned(self.literal_heap)
+
+    def best_literals(self):
+        """All unassigned literals appearing in the most clauses"""
+        return self.top_unassigned_ties(self.literal_heap)
+
+    def best_variable(self):
+        """Unassigned variable appearing in the most clauses"""
+        return self.top_unassigned(self.variable_heap)
+
+    def best_variables(self):
+        """All unassigned variables appearing in the most clauses"""
+        return self.top_unassigned_ties(self.variable_heap)
+
+    def best_jw_literal(self):
+        """Unassigned literal with the highest Jeroslow-Wang weight"""
+        return self.top_unassigned(self.jw_heap)
+
+    def smallest_unresolved_counts(self):
+        """Count the unassigned literals in the smallest clauses that are not satisfied yet"""
+        sizes = [size for size, clause_ids in self.unresolved.items() if clause_ids]
+        # If all clauses are satisfied, just count over all clauses
+        counts = self.unresolved_counts[min(sizes)] if sizes else self.occurrences
+        assignments = self.assignments
+        return {lit: count for lit, count in counts.items() if count and assignments[abs(lit)] == UNDEFINED}
+
+
+def memory_mb(pid=None):
+    """
+    Current resident memory of the process `pid` (this one by default) in megabytes, None where
+    /proc/<pid>/statm is missing
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def peak_memory_mb():
+    """Peak resident memory of the process in megabytes, 0 where the resource module is missing"""
+    if resource is None:
+        return 0
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
 
 
 if __name__ == "__main__":
@@ -595,25 +1482,74 @@ if __name__ == "__main__":
     available_heuristics = ["DLIS", "RDLIS", "DLCS", "RDLCS", "Lishuo", "Lishuo2", "2-Clause",
                             "MOM", "JW", "VSIDS", "Random", "Ordered", "BigBang", "SurpriseMe"]
     if len(sys.argv) < 4:
-        print("Usage: python CDCL.py <filepath> <branching_heuristic> <restart?>")
+        print("Usage: python CDCL.py <filepath> <branching_heuristic> <restart?> [preprocess?] [timers?]")
         print("Available heuristics: " + str(available_heuristics))
-        print("Restart = 1 to enable restart.")
+        print("Restart = 0 to disable restart, 1 for Luby or one of " + str(list(restart_policies.RESTART_POLICIES)))
+        print("Preprocess = 1 to simplify the formula before search.")
+        print("Timers = 1 to time propagation, conflict analysis, backtracking, decisions and reductions.")
         exit(1)
 
     path = sys.argv[1]
     heuristic = sys.argv[2]
-    restart = sys.argv[3] == "1"
+    restart = sys.argv[3]
+    preprocess = len(sys.argv) > 4 and sys.argv[4] == "1"
+    timers = len(sys.argv) > 5 and sys.argv[5] == "1"
 
+    my_logger.init_logger()
     total_time = 0
     print("Running...")
     t1 = time.time()
-    solver = CDCLSolver(path, heuristic, restart)
-    ans = solver.solve()
+    # CDCL_PROOF=<file> writes a DRAT proof there, in binary unless the name ends with .drat
+    proof_path = os.environ.get("CDCL_PROOF")
+    proof = drat.ProofWriter(proof_path, binary=not proof_path.endswith(".drat")) if proof_path else None
+    # CDCL_VECTORIZED=1 scores the counting heuristics with NumPy
+    vectorized = os.environ.get("CDCL_VECTORIZED") == "1"
+    solver = CDCLSolver(path, heuristic, restart, preprocess=preprocess, proof=proof, vectorized=vectorized)
+    if timers:
+        solver.enable_timers()
+    # CDCL_TRACE=<file> dumps the last search events there, as JSONL for a .jsonl file
+    trace_path = os.environ.get("CDCL_TRACE")
+    if trace_path:
+        solver.enable_tracing()
+    # CDCL_CHECKPOINT=<file> resumes from that checkpoint if it exists and keeps it up to date
+    checkpoint_path = os.environ.get("CDCL_CHECKPOINT")
+    if checkpoint_path:
+        if os.path.exists(checkpoint_path):
+            print("Imported learnt clauses: ", solver.load_checkpoint(checkpoint_path))
+        solver.checkpoint_path = checkpoint_path
+    solver.progress_interval = 1000
+    solver.progress_callbacks.append(solver_stats.print_progress)
+    # Ctrl-C stops the search with "UNKNOWN" and the statistics so far
+    signal.signal(signal.SIGINT, lambda signum, frame: solver.interrupt())
+    try:
+        ans = solver.solve()
+    finally:
+        if trace_path:
+            solver.tracer.dump(trace_path)
+        if proof:
+            proof.close()
     t2 = time.time()
     total_time += t2 - t1
     print("Answer: ", ans)
+    if ans == "UNKNOWN":
+        print("Stopped by: ", solver.stop_reason)
     print("Verify: ", solver.checkSAT())
+    if proof and ans == "UNSAT":
+        verified, reason = drat.check_proof(my_parser.iter_clauses(my_parser.read_file_flat(path)[0]), proof_path)
+        print("Proof: ", "verified" if verified else reason)
     print("Heuristic: ", solver.PBV_heuristic)
-    print("Branching: ", solver.num_PBV_invocations)
+    print("Branching: ", solver.stats.num_decisions)
+    print("Conflicts: ", solver.stats.num_conflicts)
+    print("Propagations: ", solver.stats.num_propagations)
+    print("Restarts: ", solver.stats.num_restarts)
+    print("Learnt clauses kept/deleted: ", len(solver.learnt_db), "/", solver.stats.num_learnt_deleted)
+    print("Learnt clause average size/LBD: ", round(solver.stats.average_learnt_size, 2), "/",
+          round(solver.stats.average_lbd, 2))
+    for phase, seconds in solver.stats.phase_times.items():
+        print(f"Time in {phase}: ", seconds)
+    if solver.preprocessor:
+        p = solver.preprocessor
+        print("Preprocess subsumed/strengthened/pure/eliminated: ",
+              p.num_subsumed, "/", p.num_strengthened, "/", p.num_pure, "/", len(p.eliminated))
     print("Time: ", total_time)
 
@@ -0,0 +1,151 @@
+import os
+import random
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from CDCL import CDCLSolver, memory_mb
+
+# Options of solve_many: solver settings, then the budgets of CDCLSolver
+SOLVER_OPTIONS = {"heuristic", "restart", "preprocess", "seed"}
+BUDGET_OPTIONS = {"max_conflicts", "max_decisions", "max_propagations", "max_time", "max_memory"}
+# Solver settings -> CDCLSolver arguments, the solver's defaults apply to the ones not given
+SOLVER_ARGUMENTS = {"heuristic": "PBV_heuristic", "restart": "restart", "preprocess": "preprocess"}
+
+
+def solve_chunk(task):
+    """
+    Worker process: solve a chunk of (index, input) items, each failure reported on its own.
+    Return the results and the items left for a fresh process, when the memory this one kept
+    from the first items of the chunk already reaches the max_memory budget.
+    """
+    items, options = task
+    results = []
+    max_memory = options.get("max_memory")
+    for position, (index, source) in enumerate(items):
+        if position and max_memory is not None and (memory_mb() or 0) >= max_memory:
+            return results, items[position:]
+        try:
+            random.seed(options.get("seed", 0))
+            arguments = {SOLVER_ARGUMENTS[name]: options[name] for name in SOLVER_ARGUMENTS.keys() & options.keys()}
+            if isinstance(source, (str, os.PathLike)):
+                solver = CDCLSolver(os.fspath(source), **arguments)
+            else:
+                solver = CDCLSolver.from_clauses(source, **arguments)
+            for name in BUDGET_OPTIONS & set(options):
+                setattr(solver, name, options[name])
+            answer = solver.solve()
+            stats = solver.stats.as_dict()
+            stats["stop_reason"] = solver.stop_reason
+            results.append((index, answer, stats))
+        except Exception as e:
+            results.append((index, "ERROR", {"error": repr(e)}))
+    return results, []
+
+
+def iter_chunks(inputs, options, chunksize, pending):
+    """Group the inputs into chunks of (index, input), each input kept in `pending` until solved"""
+    chunk = []
+    for index, source in enumerate(inputs):
+        pending[index] = source
+        chunk.append((index, source))
+        if len(chunk) == chunksize:
+            yield chunk, options
+            chunk = []
+    if chunk:
+        yield chunk, options
+
+
+def isolate(items, options, make_executor):
+    """
+    Solve the (index, input) items lost with a worker process that died, one at a time in a
+    process of their own, and yield their results. The items whose process dies again are
+    reported as errors.
+    """
+    executor = make_executor(1)
+    try:
+        for item in items:
+            try:
+                results, _ = executor.submit(solve_chunk, ([item], options)).result()
+                yield from results
+            except BrokenProcessPool as e:
+                yield item[0], "ERROR", {"error": repr(e)}
+                executor.shutdown()
+                executor = make_executor(1)
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def solve_many(inputs, workers=None, options=None, chunksize=None):
+    """
+    Solve every input, a CNF file path or an iterable of clauses (each an iterable of non-zero
+    DIMACS literals), over a pool of `workers` processes and yield (input, result, stats) as
+    each chunk of `chunksize` inputs completes. The result is as returned by CDCLSolver.solve,
+    or "ERROR" when solving the input raised or killed its process (out of memory, signal),
+    stats then being {"error": <the exception>}. Otherwise stats is SolverStats.as_dict with
+    the "stop_reason" of an "UNKNOWN" result. `options` may set "heuristic", "restart",
+    "preprocess" (CDCLSolver defaults if not given), "seed" and the max_* budgets of CDCLSolver,
+    for every input. With "max_memory", every chunk runs in a fresh process, so that the
+    memory kept from other inputs does not count against the budget.
+    """
+    options = dict(options or {})
+    unknown = set(options) - SOLVER_OPTIONS - BUDGET_OPTIONS
+    if unknown:
+        raise ValueError(f"Unknown options {sorted(unknown)}")
+    workers = workers or os.cpu_count()
+    if chunksize is None:
+        # Small chunks when the number of inputs is unknown, else about 4 chunks per worker
+        chunksize = max(1, min(64, len(inputs) // (4 * workers))) if hasattr(inputs, "__len__") else 8
+
+    def make_executor(num_workers):
+        if options.get("max_memory") is None:
+            return ProcessPoolExecutor(num_workers)
+        return ProcessPoolExecutor(num_workers, max_tasks_per_child=1)
+
+    pending = {}  # dict - input index:int -> input, until solved
+    chunks = iter_chunks(inputs, options, chunksize, pending)
+    deferred = deque()  # chunks of the items a worker left for a fresh process
+    running = {}  # dict - future -> the (index, input) items it solves
+    executor = make_executor(workers)
+    try:
+        while True:
+            # Two chunks per worker in flight, few enough to retry when a worker process dies
+            while len(running) < 2 * workers:
+                task = deferred.popleft() if deferred else next(chunks, None)
+                if task is None:
+                    break
+                running[executor.submit(solve_chunk, task)] = task[0]
+            if not running:
+                return
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            lost = []
+            for future in done:
+                items = running.pop(future)
+                try:
+                    results, rest = future.result()
+                except BrokenProcessPool:
+                    lost.extend(items)
+                    continue
+                if rest:
+                    deferred.append((rest, options))
+                for index, answer, stats in results:
+                    yield pending.pop(index), answer, stats
+            if not lost:
+                continue
+            # Every chunk in flight fails with the pool, find out which inputs killed it
+            for future in wait(running).done:
+                if future.exception() is None:
+                    results, rest = future.result()
+                    if rest:
+                        deferred.append((rest, options))
+                    for index, answer, stats in results:
+                        yield pending.pop(index), answer, stats
+                else:
+                    lost.extend(running[future])
+            running.clear()
+            executor.shutdown()
+            for index, answer, stats in isolate(lost, options, make_executor):
+                yield pending.pop(index), answer, stats
+            executor = make_executor(workers)
+    finally:
+        executor.shutdown(cancel_futures=True)
@@ -0,0 +1,196 @@
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+
+import Benchmark
+
+DEFAULT_FAMILIES = ["uf20-91", "uf50-218", "uf100-430", "backup/uuf50-218", "backup/uuf100-430",
+                    "CBS_k3_n100_m403_b10"]
+
+
+def percentile(values, fraction):
+    """Percentile of `values` by linear interpolation, `fraction` in [0, 1]"""
+    values = sorted(values)
+    position = (len(values) - 1) * fraction
+    low = math.floor(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+
+
+def run_suite(heuristics, families, root, num_instances, repeat, seed=0, restart=False, timeout=None):
+    """
+    Solve the first `num_instances` instances of every family `repeat` times with every
+    heuristic, in this process one at a time so that runs do not compete for cores.
+    Return a dict - "heuristic|family/instance" -> record with the time of every run.
+    """
+    results = {}
+    for heuristic in heuristics:
+        for family in families:
+            directory = os.path.join(root, family)
+            expected = Benchmark.expected_answer(directory)
+            names = sorted(name for name in os.listdir(directory) if name.endswith(".cnf"))[:num_instances]
+            for name in names:
+                times = []
+                for _ in range(repeat):
+                    result = Benchmark.solve_instance((os.path.join(directory, name), expected, heuristic,
+                                                       restart, timeout, None, seed, None))
+                    times.append(result["time"])
+                results[f"{heuristic}|{family}/{name}"] = {
+                    "heuristic": heuristic, "family": family, "times": times, "answer": result["answer"],
+                    "correct": result["correct"], "decisions": result["decisions"],
+                    "conflicts": result["conflicts"], "propagations": result["propagations"]}
+                print(f"{heuristic} {family}/{name}: {result['answer']}, "
+                      f"median {statistics.median(times):.3f}s over {repeat} runs", file=sys.stderr)
+    return results
+
+
+def group(results):
+    """Split the records by (heuristic, family)"""
+    groups = {}
+    for key, record in sorted(results.items()):
+        groups.setdefault((record["heuristic"], record["family"]), {})[key] = record
+    return groups
+
+
+def summarize(results):
+    """Median and 90th percentile of the per-instance metrics of every heuristic and family"""
+    rows = []
+    for (heuristic, family), records in group(results).items():
+        times = [statistics.median(r["times"]) for r in records.values()]
+        row = {"heuristic": heuristic, "family": family, "instances": len(records),
+               "wrong": sum(1 for r in records.values() if r["correct"] is False)}
+        metrics = {
+            "time": times,
+            "decisions": [r["decisions"] or 0 for r in records.values()],
+            "conflicts": [r["conflicts"] or 0 for r in records.values()],
+            "propagations_per_second": [(r["propagations"] or 0) / t if t else 0.0
+                                        for r, t in zip(records.values(), times)],
+        }
+        for metric, values in metrics.items():
+            row[f"{metric}_median"] = statistics.median(values)
+            row[f"{metric}_p90"] = percentile(values, 0.9)
+        rows.append(row)
+    return rows
+
+
+def print_summary(rows):
+    for row in rows:
+        print(f"{row['heuristic']} {row['family']} ({row['instances']} instances, {row['wrong']} wrong): "
+              f"time {row['time_median']:.3f}s (p90 {row['time_p90']:.3f}s), "
+              f"decisions {row['decisions_median']:.0f} (p90 {row['decisions_p90']:.0f}), "
+              f"conflicts {row['conflicts_median']:.0f} (p90 {row['conflicts_p90']:.0f}), "
+              f"propagations/s {row['propagations_per_second_median']:.0f}")
+
+
+def wilcoxon_signed_rank(differences):
+    """
+    One-sided p-value of the Wilcoxon signed-rank test that `differences` are centered above 0,
+    with the normal approximation
+    """
+    differences = [d for d in differences if d != 0]
+    n = len(differences)
+    if n == 0:
+        return 1.0
+    order = sorted(range(n), key=lambda i: abs(differences[i]))
+    ranks = [0.0] * n
+    i = 0
+    while i < n:
+        # Tied absolute differences share their average rank
+        j = i
+        while j + 1 < n and abs(differences[order[j + 1]]) == abs(differences[order[i]]):
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2 + 1
+        i = j + 1
+    positive = sum(rank for rank, d in zip(ranks, differences) if d > 0)
+    mean = n * (n + 1) / 4
+    deviation = math.sqrt(n * (n + 1) * (2 * n + 1) / 24)
+    return 0.5 * math.erfc((positive - mean) / deviation / math.sqrt(2))
+
+
+def compare(baseline, results, threshold=0.1, alpha=0.05):
+    """
+    Compare every heuristic and family with the baseline on the instances both have. A group
+    is flagged when its geometric mean time ratio exceeds 1 + `threshold` and the signed-rank
+    test of the per-instance log ratios is significant at `alpha`. Return the comparison rows.
+    """
+    rows = []
+    baseline_groups = group(baseline)
+    for key, records in group(results).items():
+        old = baseline_groups.get(key, {})
+        common = [k for k in records if k in old]
+        if not common:
+            continue
+        log_ratios = [math.log(max(statistics.median(records[k]["times"]), 1e-6) /
+                               max(statistics.median(old[k]["times"]), 1e-6)) for k in common]
+        ratio = math.exp(statistics.mean(log_ratios))
+        p_value = wilcoxon_signed_rank(log_ratios)
+        decisions = sum(records[k]["decisions"] or 0 for k in common)
+        old_decisions = sum(old[k]["decisions"] or 0 for k in common)
+        rows.append({"heuristic": key[0], "family": key[1], "instances": len(common), "time_ratio": ratio,
+                     "p_value": p_value, "decision_ratio": decisions / old_decisions if old_decisions else 1.0,
+                     "slower": ratio > 1 + threshold and p_value < alpha})
+    return rows
+
+
+def print_comparison(rows):
+    for row in rows:
+        flag = "SLOWER" if row["slower"] else "ok"
+        print(f"{flag:6} {row['heuristic']} {row['family']} ({row['instances']} instances): "
+              f"time x{row['time_ratio']:.2f} (p = {row['p_value']:.3f}), "
+              f"decisions x{row['decision_ratio']:.2f}")
+
+
+def load_baseline(filepath):
+    with open(filepath) as f:
+        return json.load(f)
+
+
+def save_baseline(filepath, results, settings):
+    with open(filepath, "w") as f:
+        json.dump({"settings": settings, "results": results}, f, indent=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the solver against a stored baseline")
+    parser.add_argument("heuristics", help="comma separated branching heuristics")
+    parser.add_argument("--root", default="../data/test", help="directory of instance families")
+    parser.add_argument("--families", default=",".join(DEFAULT_FAMILIES), help="comma separated families")
+    parser.add_argument("--instances", type=int, default=10, help="instances per family")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per instance")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of every run")
+    parser.add_argument("--restart", default="0", help="restart policy, as for CDCL.py")
+    parser.add_argument("--timeout", type=float, default=None, help="wall-clock seconds per run")
+    parser.add_argument("--baseline", default="benchmark_baseline.json", help="baseline file")
+    parser.add_argument("--save", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare the results with the baseline")
+    parser.add_argument("--threshold", type=float, default=0.1, help="time ratio above 1 that counts as slower")
+    parser.add_argument("--alpha", type=float, default=0.05, help="significance level of the comparison")
+    args = parser.parse_args()
+
+    settings = {"heuristics": args.heuristics, "families": args.families, "instances": args.instances,
+                "repeat": args.repeat, "seed": args.seed, "restart": args.restart,
+                "python": platform.python_version(), "machine": platform.machine(),
+                "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+    results = run_suite(args.heuristics.split(","), args.families.split(","), args.root, args.instances,
+                        args.repeat, args.seed, args.restart, args.timeout)
+    print_summary(summarize(results))
+
+    if args.compare:
+        baseline = load_baseline(args.baseline)
+        for name in ("seed", "restart", "python", "machine"):
+            if baseline["settings"].get(name) != settings[name]:
+                print(f"Warning: baseline {name} {baseline['settings'].get(name)} differs from {settings[name]}")
+        rows = compare(baseline["results"], results, args.threshold, args.alpha)
+        print("-----------------------------------")
+        print_comparison(rows)
+    if args.save:
+        save_baseline(args.baseline, results, settings)
+        print(f"Baseline saved to {args.baseline}")
+    if args.compare and any(row["slower"] for row in rows):
+        exit(1)
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import struct
+import sys
+from array import array
+
+# Magic, number of variables, number of original clauses, digest of those clauses, VSIDS increment,
+# number of learnt clauses and size of their literal array, then the arrays: activities (float64),
+# phases (int8), learnt clause LBDs (int32) and learnt literals (int32, each clause ended by 0),
+# all little-endian
+MAGIC = b"CDCLCKP1"
+HEADER = struct.Struct("<8sqq16sdqq")
+
+
+def formula_digest(clauses):
+    """Digest of a sequence of clauses, independent of the order of literals inside each clause"""
+    digest = hashlib.blake2b(digest_size=16)
+    for clause in clauses:
+        digest.update(array("i", sorted(clause) + [0]).tobytes())
+    return digest.digest()
+
+
+def little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+class Checkpoint:
+    """
+    What a CDCLSolver learnt about a formula: its learnt clauses with their LBD, the VSIDS
+    activities and the saved phases, along with the number and digest of the original clauses
+    it was learnt from, so that a solver can tell whether that formula is a prefix of its own.
+    """
+
+    def __init__(self, num_original, digest, activities, vsid_increment, phases, learnt_literals, learnt_lbds):
+        self.num_original = num_original
+        self.digest = digest
+        self.activities = activities  # array('d') - variable -> VSIDS activity
+        self.vsid_increment = vsid_increment
+        self.phases = phases  # array('b') - variable -> last value assigned
+        self.learnt_literals = learnt_literals  # array('i') of the learnt clauses, each ended by 0
+        self.learnt_lbds = learnt_lbds  # array('i') - learnt clause index -> LBD
+
+    @property
+    def num_variables(self):
+        return len(self.activities) - 1
+
+    def learnt_clauses(self):
+        """Yield (literals, lbd) for every learnt clause, in the order they were learnt"""
+        start = 0
+        literals = self.learnt_literals
+        for lbd in self.learnt_lbds:
+            end = literals.index(0, start)
+            yield literals[start:end].tolist(), lbd
+            start = end + 1
+
+    def save(self, filepath):
+        """
+        Write the checkpoint to `filepath`. The file is written next to it and renamed, so that
+        a process killed while saving leaves the previous checkpoint intact.
+        """
+        temporary = filepath + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(HEADER.pack(MAGIC, self.num_variables, self.num_original, self.digest,
+                                self.vsid_increment, len(self.learnt_lbds), len(self.learnt_literals)))
+            for values in (self.activities, self.phases, self.learnt_lbds, self.learnt_literals):
+                f.write(little_endian(values).tobytes())
+        os.replace(temporary, filepath)
+
+    @classmethod
+    def load(cls, filepath):
+        with open(filepath, "rb") as f:
+            data = f.read()
+        magic, num_variables, num_original, digest, vsid_increment, num_learnt, num_literals = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{filepath} is not a checkpoint")
+        offset = HEADER.size
+        arrays = []
+        for typecode, length in (("d", num_variables + 1), ("b", num_variables + 1), ("i", num_learnt),
+                                 ("i", num_literals)):
+            values = array(typecode)
+            values.frombytes(data[offset:offset + values.itemsize * length])
+            offset += values.itemsize * length
+            arrays.append(little_endian(values))
+        activities, phases, learnt_lbds, learnt_literals = arrays
+        return cls(num_original, digest, activities, vsid_increment, phases, learnt_literals, learnt_lbds)
@@ -0,0 +1,100 @@
+from array import array
+
+# Every clause is a header followed by its literals: [size, flags | lbd << FLAG_BITS, lit, lit, ...]
+HEADER = 2
+LEARNT = 1
+DELETED = 2
+FLAG_BITS = 2
+
+
+class ClauseArena:
+    """
+    Clauses stored back to back in one array('i'). A clause is referred to by the index of
+    its header in the array (its cref). Deleted clauses stay in place until garbage_collect
+    compacts the array.
+    """
+
+    def __init__(self):
+        self.data = array("i")
+        self.activity = {}  # dict - cref:int -> activity, for learnt clauses
+        self.wasted = 0  # number of array entries taken by deleted clauses
+        self.num_clauses = 0  # live clauses
+        self.num_learnt = 0  # live learnt clauses
+
+    def add(self, literals, learnt=False, lbd=0):
+        """Append a clause and return its cref"""
+        cref = len(self.data)
+        self.data.append(len(literals))
+        self.data.append((LEARNT if learnt else 0) | lbd << FLAG_BITS)
+        self.data.extend(literals)
+        self.num_clauses += 1
+        if learnt:
+            self.num_learnt += 1
+            self.activity[cref] = 0.0
+        return cref
+
+    def size(self, cref):
+        return self.data[cref]
+
+    def literals(self, cref):
+        """Literals of a clause as an array, watched literals first"""
+        return self.data[cref + HEADER:cref + HEADER + self.data[cref]]
+
+    def is_learnt(self, cref):
+        return self.data[cref + 1] & LEARNT != 0
+
+    def is_deleted(self, cref):
+        return self.data[cref + 1] & DELETED != 0
+
+    def lbd(self, cref):
+        return self.data[cref + 1] >> FLAG_BITS
+
+    def set_lbd(self, cref, lbd):
+        self.data[cref + 1] = (self.data[cref + 1] & (LEARNT | DELETED)) | lbd << FLAG_BITS
+
+    def delete(self, cref):
+        """Mark a clause as deleted, its space is reclaimed by garbage_collect"""
+        if self.is_deleted(cref):
+            return
+        self.data[cref + 1] |= DELETED
+        self.wasted += HEADER + self.data[cref]
+        self.num_clauses -= 1
+        if self.is_learnt(cref):
+            self.num_learnt -= 1
+            self.activity.pop(cref, None)
+
+    def clauses(self, learnt=None):
+        """Yield the cref of every live clause, only learnt or original ones if `learnt` is given"""
+        data = self.data
+        cref = 0
+        end = len(data)
+        while cref < end:
+            flags = data[cref + 1]
+            if not flags & DELETED and (learnt is None or bool(flags & LEARNT) == learnt):
+                yield cref
+            cref += HEADER + data[cref]
+
+    def iter_literals(self, learnt=None):
+        """Yield the literals of every live clause"""
+        for cref in self.clauses(learnt):
+            yield self.literals(cref)
+
+    def garbage_collect(self):
+        """
+        Move the live clauses to a new array, dropping deleted ones.
+        Return a dict - old cref:int -> new cref, every cref held outside must be relocated.
+        """
+        data = self.data
+        new_data = array("i")
+        relocation = {}
+        cref = 0
+        while cref < len(data):
+            end = cref + HEADER + data[cref]
+            if not data[cref + 1] & DELETED:
+                relocation[cref] = len(new_data)
+                new_data.extend(data[cref:end])
+            cref = end
+        self.data = new_data
+        self.activity = {relocation[cref]: activity for cref, activity in self.activity.items()}
+        self.wasted = 0
+        return relocation
@@ -0,0 +1,100 @@
+from array import array
+
+from CDCL import CDCLSolver, TRUE
+
+
+class CNFBuilder:
+    """
+    Builds a formula in memory for CDCLSolver. Variables are allocated by name (any hashable,
+    such as a tuple), numbered from 1 in allocation order. Clauses are tuples of DIMACS
+    literals, the literal of a name being var(name) or -var(name).
+    """
+
+    def __init__(self):
+        self.indices = {}  # dict - name -> variable:int
+        self.names = [None]  # list - variable:int -> name
+        self.literals = array("i")  # every clause followed by 0, as my_parser.read_file_flat returns
+        self.num_clauses = 0
+
+    @property
+    def num_variables(self):
+        return len(self.names) - 1
+
+    def var(self, name):
+        """Variable of a name, allocated on first use"""
+        index = self.indices.get(name)
+        if index is None:
+            index = self.indices[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def __getitem__(self, name):
+        """Variable of a name already allocated"""
+        return self.indices[name]
+
+    def __contains__(self, name):
+        return name in self.indices
+
+    def name(self, literal):
+        """Name of the variable of a literal"""
+        return self.names[abs(literal)]
+
+    def add_clause(self, literals):
+        for lit in literals:
+            if not 0 < abs(lit) <= self.num_variables:
+                raise ValueError(f"Literal {lit} is not on an allocated variable")
+        self.literals.extend(literals)
+        self.literals.append(0)
+        self.num_clauses += 1
+
+    def add_clauses(self, clauses):
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def at_most_one(self, literals):
+        """One clause per pair of literals"""
+        literals = list(literals)
+        for i, a in enumerate(literals):
+            for b in literals[i + 1:]:
+                self.add_clause((-a, -b))
+
+    def exactly_one(self, literals):
+        literals = list(literals)
+        self.add_clause(literals)
+        self.at_most_one(literals)
+
+    def equivalent(self, a, b):
+        """Literals a and b take the same value"""
+        self.add_clause((-a, b))
+        self.add_clause((a, -b))
+
+    def formula(self):
+        """The (literals, num_variables, num_clauses) tuple CDCLSolver takes as `formula`"""
+        return self.literals, self.num_variables, self.num_clauses
+
+    def solver(self, PBV_heuristic="DLIS", restart=False, **kwargs):
+        """A CDCLSolver for the formula, without going through a file"""
+        return CDCLSolver(None, PBV_heuristic, restart, formula=self.formula(), **kwargs)
+
+    def decode(self, model):
+        """Model returned by CDCLSolver.solve as a dict - name -> bool"""
+        return {self.names[var]: value == TRUE for var, value in model.items() if var <= self.num_variables}
+
+    def true_names(self, model):
+        """Names of the variables true in a model, in allocation order"""
+        return [self.names[var] for var in sorted(model) if model[var] == TRUE and var <= self.num_variables]
+
+    def to_dimacs(self, comment=None):
+        lines = [f"c {line}".rstrip() for line in comment.split("\n")] if comment else []
+        lines.append(f"p cnf {self.num_variables} {self.num_clauses}")
+        clause = []
+        for lit in self.literals:
+            clause.append(str(lit))
+            if lit == 0:
+                lines.append(" ".join(clause))
+                clause = []
+        return "\n".join(lines) + "\n"
+
+    def write_dimacs(self, filepath, comment=None):
+        with open(filepath, "w") as f:
+            f.write(self.to_dimacs(comment))
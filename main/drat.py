@@ -0,0 +1,356 @@
+import sys
+
+import my_parser
+
+TEXT_BYTES = set(b"0123456789- dc\n\r\t")
+
+
+class ProofWriter:
+    """
+    Buffered DRAT proof output, in the text format or in the binary format of drat-trim:
+    "a" or "d", then each literal l as the varint of 2 * |l| + (l < 0), then 0.
+    """
+
+    def __init__(self, filepath, binary=False, buffer_size=1 << 20):
+        self.file = open(filepath, "wb")
+        self.binary = binary
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        self.num_added = 0
+        self.num_deleted = 0
+
+    def add(self, literals):
+        self.num_added += 1
+        self.write(b"a", literals)
+
+    def delete(self, literals):
+        self.num_deleted += 1
+        self.write(b"d", literals)
+
+    def write(self, kind, literals):
+        buffer = self.buffer
+        if self.binary:
+            buffer += kind
+            for lit in literals:
+                value = 2 * lit if lit > 0 else -2 * lit + 1
+                while value > 127:
+                    buffer.append(value & 127 | 128)
+                    value >>= 7
+                buffer.append(value)
+            buffer.append(0)
+        else:
+            if kind == b"d":
+                buffer += b"d "
+            for lit in literals:
+                buffer += b"%d " % lit
+            buffer += b"0\n"
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_proof(filepath, binary=None):
+    """
+    Return the steps of a DRAT proof as a list of (is_deletion, literals). The format is
+    guessed from the first bytes unless `binary` is given.
+    """
+    with open(filepath, "rb") as f:
+        data = f.read()
+    if binary is None:
+        binary = data[:1] == b"a" or any(byte not in TEXT_BYTES for byte in data[:64])
+    steps = []
+    if binary:
+        i = 0
+        while i < len(data):
+            is_deletion = data[i] == ord("d")
+            i += 1
+            literals = []
+            while True:
+                value = shift = 0
+                while True:
+                    byte = data[i]
+                    i += 1
+                    value |= (byte & 127) << shift
+                    shift += 7
+                    if byte < 128:
+                        break
+                if value == 0:
+                    break
+                literals.append(-(value >> 1) if value & 1 else value >> 1)
+            steps.append((is_deletion, literals))
+        return steps
+
+    literals = []
+    is_deletion = False
+    for line in data.split(b"\n"):
+        if line[:1] == b"c":
+            continue
+        for token in line.split():
+            if token == b"d":
+                is_deletion = True
+                continue
+            lit = int(token)
+            if lit == 0:
+                steps.append((is_deletion, literals))
+                literals = []
+                is_deletion = False
+            else:
+                literals.append(lit)
+    return steps
+
+
+class DRATChecker:
+    """
+    Backward DRAT checker. The proof is first replayed up to its empty clause, then lemmas are
+    checked from the last to the first, skipping the ones no checked lemma depended on.
+    A lemma is checked by reverse unit propagation (RUP) over two-watched-literal lists, where
+    clauses already known to be needed (the core) are propagated first so that fewer new
+    clauses get pulled into the core. Lemmas that are not RUP are checked for RAT on their
+    first literal. Deleting a unit clause is ignored, as drat-trim does.
+    """
+
+    def __init__(self, clauses):
+        self.clauses = []  # list - clause id -> literals, watched literals first
+        self.pivots = []  # list - clause id -> first literal as written, the RAT pivot
+        self.active = []  # list - clause id -> whether the clause is in the current formula
+        self.core = []  # list - clause id -> whether a checked lemma depends on the clause
+        self.ids = {}  # dict - sorted literals:tuple -> ids of the active clauses with these literals
+        self.core_watches = {}  # dict - literal:int -> ids of core clauses watching it
+        self.watches = {}  # dict - literal:int -> ids of other clauses watching it
+        self.units = []  # ids of the clauses of length 1
+        self.values = {}  # dict - variable:int -> True / False, the current assignment
+        self.reasons = {}  # dict - variable:int -> clause id that propagated the variable
+        self.trail = []
+        self.num_checked = 0
+        for clause in clauses:
+            self.add(clause)
+        self.num_original = len(self.clauses)
+
+    def add(self, literals):
+        clause = list(dict.fromkeys(literals))
+        clause_id = len(self.clauses)
+        self.clauses.append(clause)
+        # The watches reorder the clause, keep its first literal aside
+        self.pivots.append(clause[0] if clause else None)
+        self.active.append(True)
+        self.core.append(False)
+        self.ids.setdefault(tuple(sorted(clause)), []).append(clause_id)
+        if len(clause) == 1:
+            self.units.append(clause_id)
+        elif len(clause) > 1:
+            for lit in clause[:2]:
+                self.watches.setdefault(lit, []).append(clause_id)
+        return clause_id
+
+    def find(self, literals):
+        """Id of an active clause with the given literals, None if there is none"""
+        ids = self.ids.get(tuple(sorted(set(literals))))
+        for clause_id in reversed(ids or []):
+            if self.active[clause_id]:
+                return clause_id
+        return None
+
+    def value(self, literal):
+        value = self.values.get(abs(literal))
+        return None if value is None else value == (literal > 0)
+
+    def assign(self, literal, reason):
+        self.values[abs(literal)] = literal > 0
+        self.reasons[abs(literal)] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """Unit propagation over the active clauses, core ones first. Return a conflict clause id or None."""
+        head = other_head = 0
+        trail = self.trail
+        while True:
+            if head < len(trail):
+                false_literal = -trail[head]
+                head += 1
+                conflict = self.propagate_watches(self.core_watches, false_literal, True)
+            elif other_head < len(trail):
+                # Fall back to the other clauses, one literal at a time
+                false_literal = -trail[other_head]
+                other_head += 1
+                conflict = self.propagate_watches(self.watches, false_literal, False)
+            else:
+                return None
+            if conflict is not None:
+                return conflict
+
+    def propagate_watches(self, watches, false_literal, core):
+        watchers = watches.get(false_literal)
+        if not watchers:
+            return None
+        clauses = self.clauses
+        i = j = 0
+        num_watchers = len(watchers)
+        conflict = None
+        while i < num_watchers:
+            clause_id = watchers[i]
+            i += 1
+            if not self.active[clause_id]:
+                # Deleted clauses keep their watches, the backward pass brings them back
+                watchers[j] = clause_id
+                j += 1
+                continue
+            # A clause that joined the core moves to the core watch lists
+            moved = self.core[clause_id] != core
+            target = self.core_watches if self.core[clause_id] else watches
+            clause = clauses[clause_id]
+            if clause[0] == false_literal:
+                clause[0], clause[1] = clause[1], clause[0]
+            other_value = self.value(clause[0])
+            if other_value is not True:
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        target.setdefault(clause[1], []).append(clause_id)
+                        break
+                else:
+                    if other_value is False:
+                        conflict = clause_id
+                    else:
+                        self.assign(clause[0], clause_id)
+                if clause[1] != false_literal:
+                    continue
+            if moved:
+                target.setdefault(false_literal, []).append(clause_id)
+            else:
+                watchers[j] = clause_id
+                j += 1
+            if conflict is not None:
+                break
+        watchers[j:] = watchers[i:num_watchers]
+        return conflict
+
+    def reset(self):
+        for lit in self.trail:
+            del self.values[abs(lit)]
+            del self.reasons[abs(lit)]
+        self.trail = []
+
+    def is_rup(self, literals):
+        """
+        Check whether falsifying `literals` leads to a conflict by unit propagation over the
+        active clauses, and add the clauses of that conflict to the core
+        """
+        self.reset()
+        try:
+            for lit in literals:
+                value = self.value(lit)
+                if value is True:
+                    # Tautology
+                    return True
+                if value is None:
+                    self.assign(-lit, None)
+            conflict = None
+            for clause_id in self.units:
+                if not self.active[clause_id]:
+                    continue
+                lit = self.clauses[clause_id][0]
+                value = self.value(lit)
+                if value is False:
+                    conflict = clause_id
+                    break
+                if value is None:
+                    self.assign(lit, clause_id)
+            if conflict is None:
+                conflict = self.propagate()
+            if conflict is None:
+                return False
+            self.mark_core(conflict)
+            return True
+        finally:
+            self.reset()
+
+    def mark_core(self, conflict):
+        """Add the conflict clause and the reasons it depends on to the core"""
+        self.core[conflict] = True
+        needed = set(abs(lit) for lit in self.clauses[conflict])
+        for lit in reversed(self.trail):
+            var = abs(lit)
+            if var not in needed:
+                continue
+            reason = self.reasons[var]
+            if reason is not None:
+                self.core[reason] = True
+                needed.update(abs(l) for l in self.clauses[reason])
+
+    def is_rat(self, clause_id):
+        """Check the lemma for RAT on its first literal"""
+        lemma = self.clauses[clause_id]
+        if not lemma:
+            return False
+        pivot = self.pivots[clause_id]
+        for other_id, other in enumerate(self.clauses):
+            if self.active[other_id] and -pivot in other:
+                resolvent = lemma + [lit for lit in other if lit != -pivot]
+                if not self.is_rup(resolvent):
+                    return False
+                self.core[other_id] = True
+        return True
+
+    def check(self, steps):
+        """
+        Check a proof given as (is_deletion, literals) steps, return (True, None) if it refutes
+        the formula or (False, reason) otherwise
+        """
+        # Replay the proof up to its first empty clause
+        replayed = []
+        for is_deletion, literals in steps:
+            if is_deletion:
+                clause_id = self.find(literals)
+                if clause_id is None or len(self.clauses[clause_id]) == 1:
+                    continue
+                self.active[clause_id] = False
+                replayed.append((True, clause_id))
+            else:
+                clause_id = self.add(literals)
+                replayed.append((False, clause_id))
+                if not literals:
+                    break
+        else:
+            return False, "the proof does not contain the empty clause"
+
+        # Check the lemmas backwards, each against the clauses that were active before it
+        self.core[replayed[-1][1]] = True
+        for is_deletion, clause_id in reversed(replayed):
+            if is_deletion:
+                self.active[clause_id] = True
+                continue
+            self.active[clause_id] = False
+            if not self.core[clause_id]:
+                continue
+            self.num_checked += 1
+            if not self.is_rup(self.clauses[clause_id]) and not self.is_rat(clause_id):
+                return False, f"lemma {self.clauses[clause_id]} is neither RUP nor RAT"
+        return True, None
+
+
+def check_proof(clauses, proof_path, binary=None):
+    """Check the DRAT proof at `proof_path` for the formula `clauses`, return (verified, reason)"""
+    return DRATChecker(clauses).check(read_proof(proof_path, binary))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python drat.py <cnf filepath> <proof filepath>")
+        exit(1)
+
+    literals, _, _ = my_parser.read_file_flat(sys.argv[1])
+    verified, reason = check_proof(my_parser.iter_clauses(literals), sys.argv[2])
+    print("Verified" if verified else "Not verified: " + reason)
@@ -1,6 +1,7 @@
-import re
+import sys
 import time
-from CDCL import CDCLSolver
+
+from cnf_builder import CNFBuilder
 
 
 categories = {
@@ -10,189 +11,93 @@ categories = {
 "cigar" : ["Pall Mall", "Dunhill", "Blends", "Bluemasters", "Prince"],
 "pet" : ["dogs", "birds", "cats", "horse", "fish"]
 }
+houses = range(1, 6)
 
 
 def generate_fol():
-    fol = {}
+    """Builder with the variable (category, house, value) for "house has value in category\""""
+    builder = CNFBuilder()
     for key in categories:
-        for i in range(len(categories[key])):
-            for j in range(1, 6):
-                fol[len(fol) + 1] = f"{key}({j}, {categories[key][i]})"
+        for value in categories[key]:
+            for house in houses:
+                builder.var((key, house, value))
+    return builder
 
-    return fol
 
+def generate_cnf(builder):
+    initialize_houses(builder)
+    initialize_constrains(builder)
+    generate_hints(builder)
+    return builder
 
-def generate_cnf(fol):
-    houses = initialize_houses(fol)
-    constrains = initialize_constrains(fol)
-    hints = generate_hints()
 
-    all_constrains = houses + constrains + hints
+def same_house(builder, key1, value1, key2, value2):
+    for house in houses:
+        builder.equivalent(builder[(key1, house, value1)], builder[(key2, house, value2)])
 
-    output = ""
-    output += "c\nc SAT instance of Einstein's Puzzle\nc\n"
-    output += f"p cnf {len(fol)} {len(all_constrains)}\n"
-    for constrain in all_constrains:
-        for num in constrain:
-            output += f"{num} "
-        output += "0\n"
 
-    return output
+def next_to(builder, key1, value1, key2, value2):
+    for house in houses:
+        neighbours = [builder[(key2, h, value2)] for h in (house - 1, house + 1) if h in houses]
+        builder.add_clause([-builder[(key1, house, value1)]] + neighbours)
 
 
-def generate_hints():
-    hints = []
-    # birt live in red:
-    for i in range(1, 6):
-        hints.append((-(i + 25), i))
-        hints.append((i + 25, -i))
+def generate_hints(builder):
+    same_house(builder, "nationality", "Brit", "colour", "red")
+    same_house(builder, "nationality", "Swede", "pet", "dogs")
+    same_house(builder, "nationality", "Dane", "beverage", "tea")
+    # Green left of white
+    for house in houses[:-1]:
+        builder.equivalent(builder[("colour", house, "green")], builder[("colour", house + 1, "white")])
+    same_house(builder, "colour", "green", "beverage", "coffee")
+    same_house(builder, "cigar", "Pall Mall", "pet", "birds")
+    same_house(builder, "colour", "yellow", "cigar", "Dunhill")
+    # Center milk, Norwegian first
+    builder.add_clause((builder[("beverage", 3, "milk")],))
+    builder.add_clause((builder[("nationality", 1, "Norwegian")],))
+    next_to(builder, "cigar", "Blends", "pet", "cats")
+    next_to(builder, "pet", "horse", "cigar", "Dunhill")
+    same_house(builder, "cigar", "Bluemasters", "beverage", "beer")
+    same_house(builder, "nationality", "German", "cigar", "Prince")
+    next_to(builder, "nationality", "Norwegian", "colour", "blue")
+    next_to(builder, "cigar", "Blends", "beverage", "water")
+
+
+def initialize_houses(builder):
+    # Every value is in some house
+    for key in categories:
+        for value in categories[key]:
+            builder.add_clause([builder[(key, house, value)] for house in houses])
 
-    # swede dog:
-    for i in range(1, 6):
-        hints.append((-(i + 30), (i + 100)))
-        hints.append(((i + 30), -(i + 100)))
 
-    # Dane tea:
-    for i in range(1, 6):
-        hints.append((-(i + 35), (i + 50)))
-        hints.append(((i + 35), -(i + 50)))
-    # Green left of white
-    for i in range(1, 5):
-        hints.append((-(i + 5), (i + 11)))
-        hints.append(((i + 5), -(i + 11)))
-
-    # green drink coffee
-    for i in range(1, 6):
-        hints.append((-(i + 5), (i + 55)))
-        hints.append(((i + 5), -(i + 55)))
-
-    # Pall mall bird
-    for i in range(1, 6):
-        hints.append((-(i + 75), (i + 105)))
-        hints.append(((i + 75), -(i + 105)))
-
-    # yellow house Dunhill
-    for i in range(1, 6):
-        hints.append((-(i + 15), (i + 80)))
-        hints.append(((i + 15), -(i + 80)))
-
-    # center milk
-    hints.append((63,))
-
-    # norwegian first
-    hints.append((41,))
-
-    # blends nex to cats
-    hints.append((-86, 112))
-    hints.append((-87, 111, 113))
-    hints.append((-88, 112, 114))
-    hints.append((-89, 113, 115))
-    hints.append((-90, 114))
-
-    # hosre next to dunhill
-    hints.append((-116, 82))
-    hints.append((-117, 81, 83))
-    hints.append((-118, 82, 84))
-    hints.append((-119, 83, 85))
-    hints.append((-120, 84))
-
-    # bluemasters drink beer
-    for i in range(1, 6):
-        hints.append((-(i + 90), (i + 65)))
-        hints.append(((i + 90), -(i + 65)))
-
-    # German prince
-    for i in range(1, 6):
-        hints.append((-(i + 45), (i + 95)))
-        hints.append(((i + 45), -(i + 95)))
-
-    # Norwegian next to blue
-    hints.append((-41, 22))
-    hints.append((-42, 21, 23))
-    hints.append((-43, 22, 24))
-    hints.append((-44, 23, 25))
-    hints.append((-45, 24))
-
-    # Blends next to water
-    hints.append((-86, 72))
-    hints.append((-87, 71, 73))
-    hints.append((-88, 72, 74))
-    hints.append((-89, 73, 75))
-    hints.append((-90, 74))
-
-    return hints
-
-
-def initialize_houses(fol):
-    counter = 0
-    houses = []
-    house = []
-    for key in fol:
-        if int(abs(key - 1) / 5) == counter:
-            house.append(key)
-        else:
-            houses.append(tuple(house))
-            house = []
-            house.append(key)
-            counter += 1
-    houses.append(tuple(house))
-
-    return houses
-
-
-def initialize_constrains(fol):
-    counter = 0
-    constrains = []
-    for key in fol:
-        if int(abs(key - 1) / 25) == counter:
-            for i in range(key + 1, (counter + 1) * 25 + 1):
-                if int(abs(i - 1) / 5) == int(abs(key - 1) / 5):
-                    constrains.append((-key, -i))
-                if i % 5 == key % 5:
-                    constrains.append((-key, -i))
-        else:
-            counter += 1
-            for i in range(key + 1, (counter + 1) * 25 + 1):
-                if int(abs(i - 1) / 5) == int(abs(key - 1) / 5):
-                    constrains.append((-key, -i))
-                if i % 5 == key % 5:
-                    constrains.append((-key, -i))
-
-    return constrains
-
-
-def convert_mapping_to_ans(mapping):
-    ans = []
-
-    fol = generate_fol()
-    for i in fol:
-        if mapping[i] == 1:
-            expr = re.search('\(([^)]+)', fol[i]).group(1).split(', ')
-            expr[0] = int(expr[0])
-            ans.append(expr)
-
-    ans = sorted(ans)
-
-    string = ""
-    for i in range(1, 6):
-        curr = [str(i), "0", "0", "0", "0", "0"]
-        for j in ans:
-            if j[0] == i:
-                for index, cat in enumerate(categories):
-                    if j[1] in categories[cat]:
-                        curr[index + 1] = j[1]
-
-        string += " ".join(curr) + "\n"
-    return string
+def initialize_constrains(builder):
+    # A value is in one house only, and a house has one value per category
+    for key in categories:
+        for value in categories[key]:
+            builder.at_most_one(builder[(key, house, value)] for house in houses)
+        for house in houses:
+            builder.at_most_one(builder[(key, house, value)] for value in categories[key])
+
+
+def convert_mapping_to_ans(mapping, builder):
+    table = {house: [str(house)] + ["0"] * len(categories) for house in houses}
+    keys = list(categories)
+    for key, house, value in builder.true_names(mapping):
+        table[house][keys.index(key) + 1] = value
+    return "".join(" ".join(table[house]) + "\n" for house in houses)
+
 
 if __name__ == "__main__":
-    with open('../data/einstein.cnf', 'w') as f:
-        f.write(generate_cnf(generate_fol()))
-        f.close()
     t1 = time.time()
-    solver = CDCLSolver("../data/einstein.cnf")
+    builder = generate_cnf(generate_fol())
+    solver = builder.solver()
     ans = solver.solve()
     t2 = time.time()
     print(t2 - t1)
-    print(solver.num_PBV_invocations)
-    print(convert_mapping_to_ans(ans))
+    print(solver.stats.num_decisions)
+    print(convert_mapping_to_ans(ans, builder))
+    # Blocking the solution found must leave no other one
+    print("Unique solution: ", solver.count_models(limit=2) == 1)
+    if len(sys.argv) > 1:
+        # python einstein.py <filepath> also writes the formula in DIMACS
+        builder.write_dimacs(sys.argv[1], "\nSAT instance of Einstein's Puzzle\n")
@@ -0,0 +1,94 @@
+class Heap:
+    """
+    Binary max-heap of integer items ordered by `scores[item]`.
+    `scores` is shared with the caller (list or dict), call `update` after changing a score.
+    """
+
+    def __init__(self, scores, items=()):
+        self.scores = scores
+        self.heap = []
+        self.indices = {}  # dict - item:int -> position in heap
+        for item in items:
+            self.push(item)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, item):
+        return item in self.indices
+
+    def top(self):
+        """Return the item with the highest score without removing it"""
+        return self.heap[0]
+
+    def push(self, item):
+        """Insert an item, does nothing if it is already in the heap"""
+        if item in self.indices:
+            return
+        self.indices[item] = len(self.heap)
+        self.heap.append(item)
+        self.sift_up(len(self.heap) - 1)
+
+    def pop(self):
+        """Remove and return the item with the highest score"""
+        heap = self.heap
+        top = heap[0]
+        last = heap.pop()
+        del self.indices[top]
+        if heap:
+            heap[0] = last
+            self.indices[last] = 0
+            self.sift_down(0)
+        return top
+
+    def remove(self, item):
+        """Remove an item if it is in the heap"""
+        index = self.indices.pop(item, None)
+        if index is None:
+            return
+        last = self.heap.pop()
+        if index < len(self.heap):
+            self.heap[index] = last
+            self.indices[last] = index
+            self.sift_up(index)
+            self.sift_down(self.indices[last])
+
+    def update(self, item):
+        """Restore the heap order after the score of `item` changed"""
+        index = self.indices.get(item)
+        if index is not None:
+            self.sift_up(index)
+            self.sift_down(self.indices[item])
+
+    def sift_up(self, index):
+        heap, indices, scores = self.heap, self.indices, self.scores
+        item = heap[index]
+        score = scores[item]
+        while index > 0:
+            parent = (index - 1) >> 1
+            if scores[heap[parent]] >= score:
+                break
+            heap[index] = heap[parent]
+            indices[heap[index]] = index
+            index = parent
+        heap[index] = item
+        indices[item] = index
+
+    def sift_down(self, index):
+        heap, indices, scores = self.heap, self.indices, self.scores
+        size = len(heap)
+        item = heap[index]
+        score = scores[item]
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and scores[heap[child + 1]] > scores[heap[child]]:
+                child += 1
+            if scores[heap[child]] <= score:
+                break
+            heap[index] = heap[child]
+            indices[heap[index]] = index
+            index = child
+        heap[index] = item
+        indices[item] = index
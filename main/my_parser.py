@@ -1,25 +1,92 @@
-import re
+import bz2
+import gzip
+import io
 import logging
-import my_logger
+import lzma
+from array import array
+
+CHUNK_SIZE = 1 << 20
+OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open, ".lzma": lzma.open}
 
 
 def read_file_and_parse(file_name):
     """Read file and return CNF clauses"""
-    my_logger.init_logger()
-    f = open(file_name, "r")
-    p_line = f.readline().strip()
-    while p_line[0] == 'c':
-        p_line = f.readline().strip()
-    p_line_split = [i for i in re.compile("\\s+").split(p_line)]
-    num_variables = int(p_line_split[2])
-    num_clauses = int(p_line_split[3])
-    logging.info(f"[Parser] Num variables: {num_variables}")
-    logging.info(f"[Parser] Num clauses: {num_clauses}")
+    literals, num_variables, _ = read_file_flat(file_name)
+    return set(frozenset(clause) for clause in iter_clauses(literals)), num_variables
+
+
+def iter_clauses(literals):
+    """Yield every clause of a flat array of 0-terminated clauses"""
+    start = 0
+    for end, lit in enumerate(literals):
+        if lit == 0:
+            yield literals[start:end]
+            start = end + 1
+
+
+def open_cnf(file_name):
+    """Open a CNF file in binary mode, decompressing .gz, .bz2 and .xz files"""
+    for extension, opener in OPENERS.items():
+        if file_name.endswith(extension):
+            return opener(file_name, "rb")
+    return open(file_name, "rb")
 
-    cnf = set()
-    for i in range(num_clauses):
-        next_line = f.readline().strip()
-        clause = frozenset([int(i) for i in re.compile("\\s+").split(next_line) if i != "0"])
-        cnf.add(clause)
 
-    return cnf, num_variables
+def read_file_flat(file_name, literals=None):
+    """
+    Read a DIMACS file in large chunks and append every clause, followed by 0, to `literals`
+    (a new array('i') by default). Clauses may span lines, comments may appear anywhere,
+    and a "%" line (as in SATLIB files) ends the formula. The clause count of the header is
+    not trusted. Return (literals, num_variables, num_clauses).
+    """
+    with open_cnf(file_name) as f:
+        return read_flat(f, literals)
+
+
+def parse_dimacs(data, literals=None):
+    """Parse DIMACS text (str or bytes) held in memory, as read_file_flat does"""
+    return read_flat(io.BytesIO(data.encode() if isinstance(data, str) else data), literals)
+
+
+def read_flat(f, literals=None):
+    """Parse the DIMACS formula of a binary file object, see read_file_flat"""
+    if literals is None:
+        literals = array("i")
+    start = len(literals)
+    num_variables = 0
+    declared_clauses = 0
+    carry = b""
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        data = carry + chunk
+        if chunk:
+            # Only complete lines are tokenized, the rest waits for the next chunk
+            cut = data.rfind(b"\n") + 1
+            data, carry = data[:cut], data[cut:]
+        stop = False
+        if b"c" in data or b"p" in data or b"%" in data:
+            lines = []
+            for line in data.split(b"\n"):
+                line = line.strip()
+                if not line or line[:1] == b"c":
+                    continue
+                if line[:1] == b"p":
+                    header = line.split()
+                    num_variables, declared_clauses = int(header[2]), int(header[3])
+                    continue
+                if line[:1] == b"%":
+                    stop = True
+                    break
+                lines.append(line)
+            data = b" ".join(lines)
+        literals.extend(map(int, data.split()))
+        if stop or not chunk:
+            break
+
+    # A last clause without its terminating 0
+    if len(literals) > start and literals[-1] != 0:
+        literals.append(0)
+    num_clauses = literals[start:].count(0)
+    logging.info(f"[Parser] Num variables: {num_variables}")
+    logging.info(f"[Parser] Num clauses: {num_clauses} (header: {declared_clauses})")
+    return literals, num_variables, num_clauses
@@ -0,0 +1,91 @@
+import json
+import struct
+import sys
+from array import array
+
+# Event kinds and the names of their two fields
+DECIDE = 0
+PROPAGATE = 1
+CONFLICT = 2
+LEARN = 3
+BACKJUMP = 4
+EVENTS = {
+    DECIDE: ("decide", "literal", "level"),
+    PROPAGATE: ("propagate", "literal", "reason"),
+    CONFLICT: ("conflict", "clause", "level"),
+    LEARN: ("learn", "clause", "lbd"),
+    BACKJUMP: ("backjump", "from_level", "to_level"),
+}
+
+# Binary dump: magic, capacity and number of recorded events, then (kind, a, b) little-endian int32 triples
+MAGIC = b"CDCLTRC1"
+HEADER = struct.Struct("<8sqq")
+
+
+class Tracer:
+    """
+    Ring buffer of the last `capacity` search events, each stored as three ints (kind, a, b)
+    in one array. Events are only recorded once a solver's enable_tracing attached the tracer.
+    """
+
+    def __init__(self, capacity=1 << 16):
+        self.capacity = capacity
+        self.events = array("i", bytes(12 * capacity))
+        self.num_recorded = 0  # total events recorded, the oldest ones are overwritten
+
+    def record(self, kind, a, b):
+        i = self.num_recorded % self.capacity * 3
+        events = self.events
+        events[i] = kind
+        events[i + 1] = a
+        events[i + 2] = b
+        self.num_recorded += 1
+
+    def __iter__(self):
+        """Yield the buffered events as (sequence number, kind, a, b), oldest first"""
+        first = max(0, self.num_recorded - self.capacity)
+        for seq in range(first, self.num_recorded):
+            i = seq % self.capacity * 3
+            yield seq, self.events[i], self.events[i + 1], self.events[i + 2]
+
+    def __len__(self):
+        return min(self.num_recorded, self.capacity)
+
+    def dump_jsonl(self, filepath):
+        """Write one JSON object per event"""
+        with open(filepath, "w") as f:
+            for seq, kind, a, b in self:
+                name, a_name, b_name = EVENTS[kind]
+                f.write(json.dumps({"seq": seq, "event": name, a_name: a, b_name: b}) + "\n")
+
+    def dump_binary(self, filepath):
+        """Write the events in the compact binary format read by load_binary"""
+        ordered = array("i")
+        for _, kind, a, b in self:
+            ordered.extend((kind, a, b))
+        if sys.byteorder == "big":
+            ordered.byteswap()
+        with open(filepath, "wb") as f:
+            f.write(HEADER.pack(MAGIC, self.capacity, self.num_recorded))
+            f.write(ordered.tobytes())
+
+    def dump(self, filepath):
+        """Dump as JSONL if `filepath` ends with .jsonl, in binary otherwise"""
+        if filepath.endswith(".jsonl"):
+            self.dump_jsonl(filepath)
+        else:
+            self.dump_binary(filepath)
+
+
+def load_binary(filepath):
+    """Read a binary dump back as a list of (sequence number, kind, a, b)"""
+    with open(filepath, "rb") as f:
+        magic, _, num_recorded = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{filepath} is not a trace dump")
+        events = array("i")
+        events.frombytes(f.read())
+    if sys.byteorder == "big":
+        events.byteswap()
+    first = num_recorded - len(events) // 3
+    return [(first + i // 3, events[i], events[i + 1], events[i + 2]) for i in range(0, len(events), 3)]
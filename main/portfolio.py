@@ -0,0 +1,90 @@
+import multiprocessing
+import queue
+import random
+import sys
+import time
+
+import my_logger
+import my_parser
+from CDCL import CDCLSolver
+
+# Configurations raced by default, the first `workers` of them are used
+DEFAULT_CONFIGURATIONS = [
+    {"heuristic": "VSIDS", "restart": "Luby", "seed": 0},
+    {"heuristic": "DLIS", "restart": "0", "seed": 0},
+    {"heuristic": "JW", "restart": "Glucose", "seed": 0},
+    {"heuristic": "VSIDS", "restart": "Glucose", "seed": 1},
+    {"heuristic": "MOM", "restart": "0", "seed": 0},
+    {"heuristic": "RDLIS", "restart": "Luby", "seed": 2},
+    {"heuristic": "DLCS", "restart": "0", "seed": 0},
+    {"heuristic": "VSIDS", "restart": "0", "seed": 3},
+]
+
+
+def run_configuration(formula, configuration, results):
+    """Worker process: solve the formula with one configuration and report the answer"""
+    random.seed(configuration.get("seed", 0))
+    solver = CDCLSolver(None, configuration["heuristic"], configuration.get("restart", False), formula=formula)
+    answer = solver.solve()
+    results.put((answer, configuration, solver.stats.num_decisions, solver.stats.num_conflicts))
+
+
+def solve_portfolio(filepath, configurations=None, workers=None, timeout=None):
+    """
+    Race one process per configuration on the formula at `filepath`, parsed once.
+    Return (answer, winning configuration, branching, conflicts) for the first process to
+    finish, the other processes are terminated. The answer is "UNKNOWN" if no process
+    finishes within `timeout` seconds.
+    """
+    formula = my_parser.read_file_flat(filepath)
+    if configurations is None:
+        configurations = DEFAULT_CONFIGURATIONS[:workers or multiprocessing.cpu_count()]
+
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=run_configuration, args=(formula, configuration, results),
+                                         daemon=True)
+                 for configuration in configurations]
+    for process in processes:
+        process.start()
+
+    deadline = None if timeout is None else time.time() + timeout
+    try:
+        while True:
+            try:
+                return results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+            # Stop waiting if every process died without an answer or time is up
+            if not any(process.is_alive() for process in processes) and results.empty():
+                return "UNKNOWN", None, 0, 0
+            if deadline is not None and time.time() > deadline:
+                return "UNKNOWN", None, 0, 0
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python portfolio.py <filepath> [workers] [timeout]")
+        print("Races these configurations (in order): ")
+        for c in DEFAULT_CONFIGURATIONS:
+            print("   ", c)
+        exit(1)
+
+    my_logger.init_logger()
+    path = sys.argv[1]
+    num_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    time_limit = float(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    print("Running...")
+    t1 = time.time()
+    ans, winner, branching, conflicts = solve_portfolio(path, workers=num_workers, timeout=time_limit)
+    t2 = time.time()
+    print("Answer: ", ans)
+    print("Winner: ", winner)
+    print("Branching: ", branching)
+    print("Conflicts: ", conflicts)
+    print("Time: ", t2 - t1)
@@ -0,0 +1,231 @@
+import logging
+from collections import defaultdict, deque
+
+
+class Preprocessor:
+    """
+    Simplify a CNF formula before search with top-level unit propagation, backward subsumption,
+    self-subsuming resolution, pure literal elimination and bounded variable elimination.
+    Clauses removed together with a variable are kept on a stack so that a model of the
+    simplified formula can be extended to a model of the original formula.
+    Every step is written to `proof` (a drat.ProofWriter) if given.
+    """
+
+    def __init__(self, clauses, max_occurrences=10, max_resolvent_size=20, proof=None):
+        self.max_occurrences = max_occurrences  # skip eliminating variables occurring more often
+        self.max_resolvent_size = max_resolvent_size
+        self.clauses = []  # list - clause id -> literals, None once removed
+        self.occurrences = defaultdict(set)  # dict - literal:int -> ids of clauses containing it
+        self.units = []  # literals fixed at the top level
+        self.fixed = set()  # literals of self.units
+        self.pending_units = []
+        self.elimination_stack = []  # list of (pivot literal, clause) removed with the pivot's variable
+        self.eliminated = set()  # eliminated variables
+        self.unsat = False
+        self.proof = proof
+
+        self.num_subsumed = 0
+        self.num_strengthened = 0
+        self.num_pure = 0
+
+        for clause in clauses:
+            self.add_clause(clause)
+        self.propagate_units()
+
+    def run(self):
+        """Simplify the formula and return the clauses of the simplified formula"""
+        for step in (self.subsume_all, self.eliminate_pure_literals, self.eliminate_variables, self.subsume_all):
+            if self.unsat:
+                break
+            step()
+            self.propagate_units()
+        logging.info(f"[Preprocess] subsumed {self.num_subsumed}, strengthened {self.num_strengthened}, "
+                     f"pure {self.num_pure}, eliminated {len(self.eliminated)} variables")
+        if self.unsat:
+            return [[]]
+        return [[lit] for lit in self.units] + [clause for clause in self.clauses if clause is not None]
+
+    def add_clause(self, literals, derived=False):
+        """
+        Add a clause, dropping repeated literals, tautologies and literals fixed to false.
+        A `derived` clause is implied by the formula and added to the proof.
+        """
+        clause = []
+        for lit in dict.fromkeys(literals):
+            if -lit in clause or lit in self.fixed:
+                return
+            if -lit not in self.fixed:
+                clause.append(lit)
+        if derived and self.proof:
+            self.proof.add(clause)
+        if not clause:
+            self.unsat = True
+        elif len(clause) == 1:
+            self.pending_units.append(clause[0])
+        else:
+            clause_id = len(self.clauses)
+            self.clauses.append(clause)
+            for lit in clause:
+                self.occurrences[lit].add(clause_id)
+            return clause_id
+
+    def remove_clause(self, clause_id, delete=True):
+        """Remove a clause, deleting it from the proof unless `delete` is False"""
+        if delete and self.proof:
+            self.proof.delete(self.clauses[clause_id])
+        for lit in self.clauses[clause_id]:
+            self.occurrences[lit].discard(clause_id)
+        self.clauses[clause_id] = None
+
+    def strengthen(self, clause_id, literal):
+        """Remove a false literal from a clause"""
+        clause = self.clauses[clause_id]
+        if self.proof:
+            self.proof.add([lit for lit in clause if lit != literal])
+            self.proof.delete(clause)
+        clause.remove(literal)
+        self.occurrences[literal].discard(clause_id)
+        if len(clause) == 1:
+            # The unit just added to the proof stays there, the solver relies on it
+            self.remove_clause(clause_id, delete=False)
+            self.pending_units.append(clause[0])
+
+    def propagate_units(self):
+        """Fix the pending unit literals, removing satisfied clauses and false literals"""
+        while self.pending_units and not self.unsat:
+            lit = self.pending_units.pop()
+            if lit in self.fixed:
+                continue
+            if -lit in self.fixed:
+                self.unsat = True
+                return
+            self.fixed.add(lit)
+            self.units.append(lit)
+            for clause_id in list(self.occurrences[lit]):
+                self.remove_clause(clause_id)
+            for clause_id in list(self.occurrences[-lit]):
+                self.strengthen(clause_id, -lit)
+
+    def subsume_all(self):
+        """Backward subsumption and self-subsuming resolution with every clause, shortest first"""
+        queue = deque(sorted((i for i, c in enumerate(self.clauses) if c is not None),
+                             key=lambda i: len(self.clauses[i])))
+        while queue and not self.unsat:
+            for clause_id in self.subsume(queue.popleft()):
+                if self.clauses[clause_id] is not None:
+                    queue.append(clause_id)
+            self.propagate_units()
+
+    def subsume(self, clause_id):
+        """
+        Remove the clauses subsumed by a clause and strengthen the clauses it self-subsumes.
+        Return the ids of the strengthened clauses.
+        """
+        clause = self.clauses[clause_id]
+        if clause is None:
+            return []
+        literals = set(clause)
+        # Clauses containing every literal of the clause must contain its rarest one
+        rarest = min(clause, key=lambda l: len(self.occurrences[l]))
+        for other_id in list(self.occurrences[rarest]):
+            other = self.clauses[other_id]
+            if other_id != clause_id and len(other) >= len(clause) and literals.issubset(other):
+                self.remove_clause(other_id)
+                self.num_subsumed += 1
+
+        # C = l v R strengthens D = -l v R v S into R v S
+        strengthened = []
+        for lit in clause:
+            rest = literals - {lit}
+            # Such clauses contain -l and every literal of R, look them up by the rarest of these
+            rarest = min([-lit] + list(rest), key=lambda l: len(self.occurrences[l]))
+            for other_id in list(self.occurrences[rarest]):
+                other = self.clauses[other_id]
+                if other is not None and len(other) >= len(clause) and -lit in other and rest.issubset(other):
+                    self.strengthen(other_id, -lit)
+                    self.num_strengthened += 1
+                    strengthened.append(other_id)
+        return strengthened
+
+    def variables(self):
+        return set(abs(lit) for lit, clause_ids in self.occurrences.items() if clause_ids)
+
+    def eliminate_pure_literals(self):
+        """Remove the clauses of variables occurring with one polarity only"""
+        found = True
+        while found:
+            found = False
+            for var in self.variables():
+                for lit in (var, -var):
+                    if self.occurrences[lit] and not self.occurrences[-lit]:
+                        self.eliminate(var, [lit])
+                        self.num_pure += 1
+                        found = True
+
+    def eliminate_variables(self):
+        """Replace the clauses of a variable by their resolvents when that does not grow the formula"""
+        candidates = sorted(self.variables(), key=lambda v: len(self.occurrences[v]) * len(self.occurrences[-v]))
+        for var in candidates:
+            if self.unsat:
+                return
+            positive, negative = self.occurrences[var], self.occurrences[-var]
+            if not positive or not negative or var in self.eliminated:
+                continue
+            if len(positive) > self.max_occurrences or len(negative) > self.max_occurrences:
+                continue
+            resolvents = self.resolvents(var, len(positive) + len(negative))
+            if resolvents is None:
+                continue
+            # The resolvents are added first so that the proof derives them from the removed clauses
+            for resolvent in resolvents:
+                self.add_clause(resolvent, derived=True)
+            self.eliminate(var, [var, -var])
+            self.propagate_units()
+
+    def resolvents(self, var, limit):
+        """
+        Non-tautological resolvents on `var`, or None if there are more than `limit` of them
+        or one is longer than max_resolvent_size
+        """
+        resolvents = []
+        for positive_id in self.occurrences[var]:
+            for negative_id in self.occurrences[-var]:
+                resolvent = set(self.clauses[positive_id])
+                resolvent.discard(var)
+                tautology = False
+                for lit in self.clauses[negative_id]:
+                    if lit == -var:
+                        continue
+                    if -lit in resolvent:
+                        tautology = True
+                        break
+                    resolvent.add(lit)
+                if tautology:
+                    continue
+                if len(resolvent) > self.max_resolvent_size or len(resolvents) == limit:
+                    return None
+                resolvents.append(list(resolvent))
+        return resolvents
+
+    def eliminate(self, var, pivots):
+        """Remove every clause containing one of `pivots` (literals of `var`) and remember them"""
+        self.eliminated.add(var)
+        for pivot in pivots:
+            for clause_id in list(self.occurrences[pivot]):
+                self.elimination_stack.append((pivot, list(self.clauses[clause_id])))
+                self.remove_clause(clause_id)
+
+    def extend_model(self, model):
+        """
+        Complete `model` (dict - variable:int -> bool), a model of the simplified formula, into a
+        model of the original formula
+        """
+        for lit in self.units:
+            model[abs(lit)] = lit > 0
+        for var in self.eliminated:
+            model.setdefault(var, False)
+        # Later eliminations only depend on variables still in the formula at that time
+        for pivot, clause in reversed(self.elimination_stack):
+            if not any(model.get(abs(lit), False) == (lit > 0) for lit in clause):
+                model[abs(pivot)] = pivot > 0
+        return model
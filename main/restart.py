@@ -0,0 +1,114 @@
+class RestartPolicy:
+    """Decide when the solver restarts. Policies count conflicts, not decisions."""
+
+    def __init__(self):
+        self.conflicts = 0  # conflicts since the last restart
+
+    def on_conflict(self, lbd):
+        """Called for every learnt clause with its literal block distance"""
+        self.conflicts += 1
+
+    def should_restart(self):
+        return False
+
+    def on_restart(self):
+        self.conflicts = 0
+
+
+class GeometricRestart(RestartPolicy):
+    """Restart after `threshold` conflicts, multiplying the threshold by `factor` every time"""
+
+    def __init__(self, threshold=100, factor=1.1):
+        super().__init__()
+        self.threshold = threshold
+        self.factor = factor
+
+    def should_restart(self):
+        return self.conflicts >= self.threshold
+
+    def on_restart(self):
+        super().on_restart()
+        self.threshold *= self.factor
+
+
+class LubyRestart(RestartPolicy):
+    """Restart after `unit` * luby(i) conflicts for the i-th restart (1, 1, 2, 1, 1, 2, 4, ...)"""
+
+    def __init__(self, unit=100):
+        super().__init__()
+        self.unit = unit
+        self.num_restarts = 0
+        self.threshold = unit * luby(2, 0)
+
+    def should_restart(self):
+        return self.conflicts >= self.threshold
+
+    def on_restart(self):
+        super().on_restart()
+        self.num_restarts += 1
+        self.threshold = self.unit * luby(2, self.num_restarts)
+
+
+class GlucoseRestart(RestartPolicy):
+    """
+    Restart when the recent learnt clauses are worse than average, that is when a fast
+    moving average of their LBD times `margin` exceeds a slow moving average.
+    """
+
+    def __init__(self, fast_alpha=1 / 32, slow_alpha=1 / 4096, margin=0.8, min_conflicts=50):
+        super().__init__()
+        self.fast_alpha = fast_alpha
+        self.slow_alpha = slow_alpha
+        self.margin = margin
+        self.min_conflicts = min_conflicts
+        self.fast_ema = 0.0
+        self.slow_ema = 0.0
+        self.total_conflicts = 0
+
+    def on_conflict(self, lbd):
+        super().on_conflict(lbd)
+        self.total_conflicts += 1
+        # Bias-corrected start: average plainly until the window is filled
+        self.fast_ema += (lbd - self.fast_ema) * max(self.fast_alpha, 1 / self.total_conflicts)
+        self.slow_ema += (lbd - self.slow_ema) * max(self.slow_alpha, 1 / self.total_conflicts)
+
+    def should_restart(self):
+        return self.conflicts >= self.min_conflicts and self.fast_ema * self.margin > self.slow_ema
+
+
+RESTART_POLICIES = {
+    "Geometric": GeometricRestart,
+    "Luby": LubyRestart,
+    "Glucose": GlucoseRestart,
+}
+# Lower-cased policy name -> name in RESTART_POLICIES, names are matched case-insensitively
+POLICY_NAMES = {name.lower(): name for name in RESTART_POLICIES}
+
+
+def make_restart_policy(restart):
+    """
+    Build a restart policy from a name in RESTART_POLICIES, in any case. False or "0" disables
+    restarts, True or "1" selects Luby.
+    """
+    if restart in (False, None, "0", 0):
+        return None
+    if restart in (True, "1", 1):
+        restart = "Luby"
+    name = POLICY_NAMES.get(str(restart).lower())
+    if name is None:
+        raise ValueError(f"Unknown restart policy {restart}, available: {list(RESTART_POLICIES)}")
+    return RESTART_POLICIES[name]()
+
+
+def luby(y, x):
+    """x-th element (from 0) of the Luby sequence with base y"""
+    # Find the finite subsequence that contains index x and its size
+    size, seq = 1, 0
+    while size < x + 1:
+        seq += 1
+        size = 2 * size + 1
+    while size - 1 != x:
+        size = (size - 1) >> 1
+        seq -= 1
+        x = x % size
+    return y ** seq
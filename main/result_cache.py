@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from array import array
+
+import my_parser
+from CDCL import CDCLSolver, TRUE, FALSE
+
+
+def formula_key(literals, settings=None):
+    """
+    Hex digest of the set of clauses of a flat array of 0-terminated clauses, the same whatever
+    the order of the clauses and of their literals, repeated literals or clauses, comments and
+    whitespace of the file they were read from. `settings` (a JSON-serializable dict), such as
+    the heuristic, is hashed in when the stats cached along the answer must match it.
+    """
+    clauses = sorted(set(tuple(sorted(set(clause))) for clause in my_parser.iter_clauses(literals)))
+    flat = array("i")
+    for clause in clauses:
+        flat.extend(clause)
+        flat.append(0)
+    if sys.byteorder == "big":
+        flat.byteswap()
+    digest = hashlib.blake2b(flat.tobytes(), digest_size=20)
+    if settings:
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of solver answers, one JSON file per formula in `directory` named after its
+    formula_key. Once the files take more than `max_bytes`, the least recently used ones are
+    evicted, a hit counting as a use. Several processes may share the directory.
+    The directory is only scanned when the size of the files, counted from the last scan,
+    goes over max_bytes, or every `scan_interval` insertions for the files of other processes.
+    """
+
+    def __init__(self, directory, max_bytes=64 << 20, scan_interval=256):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.scan_interval = scan_interval
+        self.hits = 0
+        self.misses = 0
+        self.size = None  # bytes of the files as of the last scan plus those written since, None before a scan
+        self.puts_since_scan = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        """
+        Return the cached entry for a formula key as a dict with the "answer" (a model as
+        returned by CDCLSolver.solve, or "UNSAT") and the "stats" of the solve, None on a miss
+        """
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            # Mark the entry as recently used
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        if entry["answer"] == "SAT":
+            entry["answer"] = {abs(lit): TRUE if lit > 0 else FALSE for lit in entry.pop("model")}
+        return entry
+
+    def put(self, key, answer, stats):
+        """Store the answer of CDCLSolver.solve for a formula key, along with SolverStats.as_dict"""
+        if answer == "UNSAT":
+            entry = {"answer": "UNSAT"}
+        else:
+            model = [var if value == TRUE else -var for var, value in sorted(answer.items())]
+            entry = {"answer": "SAT", "model": model}
+        entry["stats"] = stats
+        entry["stored"] = time.time()
+        # Written aside and renamed so that readers never see a partial file
+        temporary = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(entry, f)
+        size = os.path.getsize(temporary)
+        os.replace(temporary, self.path(key))
+        self.puts_since_scan += 1
+        if self.size is not None:
+            self.size += size
+        if self.size is None or self.size > self.max_bytes or self.puts_since_scan >= self.scan_interval:
+            self.evict()
+
+    def evict(self):
+        """
+        Once the cache takes more than max_bytes, remove the least recently used entries until it
+        takes 3/4 of it, leaving room for the next insertions without a scan
+        """
+        entries = []
+        for item in os.scandir(self.directory):
+            if item.name.endswith(".json"):
+                try:
+                    stat = item.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes if total <= self.max_bytes else self.max_bytes * 3 // 4
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.size = total
+        self.puts_since_scan = 0
+
+
+def cached_solve(cache, filepath, formula=None, **solver_args):
+    """
+    Answer for the CNF file at `filepath` (or the parsed `formula`) from `cache`, solved with
+    CDCLSolver(filepath, formula=formula, **solver_args) and stored on a miss. "UNKNOWN"
+    answers are not stored. Return (answer, stats as SolverStats.as_dict, whether it was cached).
+    """
+    if formula is None:
+        formula = my_parser.read_file_flat(filepath)
+    key = formula_key(formula[0])
+    entry = cache.get(key)
+    if entry is not None:
+        return entry["answer"], entry["stats"], True
+    solver = CDCLSolver(filepath, formula=formula, **solver_args)
+    answer = solver.solve()
+    stats = solver.stats.as_dict()
+    if answer != "UNKNOWN":
+        cache.put(key, answer, stats)
+    return answer, stats, False
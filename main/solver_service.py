@@ -0,0 +1,388 @@
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import my_logger
+import my_parser
+from CDCL import CDCLSolver, memory_mb
+
+# Budget names of a job request -> CDCLSolver attribute
+BUDGETS = {"conflicts": "max_conflicts", "decisions": "max_decisions", "propagations": "max_propagations",
+           "time": "max_time", "memory": "max_memory"}
+OPTIONS = {"heuristic", "restart", "preprocess", "seed"}
+# Options of a job request -> CDCLSolver arguments, the solver's defaults apply to the ones not given
+SOLVER_ARGUMENTS = {"heuristic": "PBV_heuristic", "restart": "restart", "preprocess": "preprocess"}
+# Longest request line, DIMACS payloads included
+MAX_LINE = 1 << 28
+
+
+def run_job(connection, cancelled, job_id, request, check_interval):
+    """Solve one job request in a worker process, return its result message"""
+    options = request.get("options", {})
+    random.seed(options.get("seed", 0))
+    if "dimacs" in request:
+        path, formula = None, my_parser.parse_dimacs(request["dimacs"])
+    else:
+        path, formula = request["path"], my_parser.read_file_flat(request["path"])
+    arguments = {SOLVER_ARGUMENTS[name]: options[name] for name in SOLVER_ARGUMENTS.keys() & options.keys()}
+    solver = CDCLSolver(path, formula=formula, **arguments)
+    for name, value in request.get("budget", {}).items():
+        setattr(solver, BUDGETS[name], value)
+
+    # Every `check_interval` conflicts, look for a cancellation and maybe report progress
+    progress = request.get("progress")
+    last_progress = time.time()
+
+    def on_progress(stats):
+        nonlocal last_progress
+        if cancelled.value == job_id:
+            solver.interrupt()
+        elif progress and time.time() - last_progress >= progress:
+            last_progress = time.time()
+            connection.send(("progress", job_id, stats.as_dict()))
+
+    solver.progress_interval = check_interval
+    solver.progress_callbacks.append(on_progress)
+    answer = solver.solve()
+    result = {"answer": answer if isinstance(answer, str) else "SAT", "stats": solver.stats.as_dict(),
+              "stop_reason": solver.stop_reason}
+    if result["answer"] == "SAT":
+        result["model"] = [var if value else -var for var, value in sorted(answer.items())]
+    return result
+
+
+def worker_main(connection, cancelled, check_interval):
+    """Worker process: solve the jobs received on `connection` one at a time until None"""
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        job_id, request = message
+        try:
+            connection.send(("done", job_id, run_job(connection, cancelled, job_id, request, check_interval)))
+        except Exception as e:
+            connection.send(("error", job_id, repr(e)))
+
+
+class Worker:
+    """A warm worker process, the pipe its jobs go through and the id of the job to cancel"""
+
+    def __init__(self, context, check_interval):
+        self.connection, child = context.Pipe()
+        self.cancelled = context.Value("q", -1, lock=False)
+        self.process = context.Process(target=worker_main, args=(child, self.cancelled, check_interval),
+                                       daemon=True)
+        self.process.start()
+        child.close()
+        self.job = None
+
+    def close(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class Job:
+    """A job request and the messages streamed back to its client"""
+
+    def __init__(self, job_id, request):
+        self.id = job_id
+        self.request = request
+        self.status = "queued"  # then "running", and "done", "cancelled" or "error"
+        self.cancel_requested = False
+        self.worker = None  # Worker running the job
+        self.events = asyncio.Queue()  # messages for the client, None once the job is over
+
+
+class SolverService:
+    """
+    Long-lived solving service: job requests are queued onto `workers` warm processes, each
+    solving one job at a time. A job is cancelled cooperatively, the worker checking for it
+    every `check_interval` conflicts, and killed (then replaced) if it is still running
+    `cancel_grace` seconds later. The "memory" budget of a job is the resident memory of its
+    worker, which is replaced first if the memory it kept from earlier jobs reaches the budget.
+
+    The protocol is one JSON object per line. A job request is
+        {"op": "solve", "dimacs": <DIMACS text> or "path": <CNF file>, "tag": <echoed back>,
+         "options": {"heuristic", "restart", "preprocess", "seed"} (CDCLSolver defaults if not given),
+         "budget": {"conflicts", "decisions", "propagations", "time", "memory"},
+         "progress": <seconds between progress messages>}
+    and is answered by messages {"job": <id>, "status": ...} with the status "queued",
+    "running", "progress" (with "stats"), then "done" (with "answer", "model" if SAT, "stats"
+    and "stop_reason" if UNKNOWN), "cancelled" or "error". {"op": "cancel", "job": <id>}
+    cancels a job and {"op": "status"} describes the queue. A line longer than MAX_LINE is
+    answered with an error and ends the requests of the client. A client may shut down its side
+    of the connection once its requests are sent, its jobs are still answered. The jobs of a
+    client that can no longer be written to are cancelled.
+    """
+
+    def __init__(self, workers=None, check_interval=100, cancel_grace=2.0):
+        self.num_workers = workers or multiprocessing.cpu_count()
+        self.check_interval = check_interval
+        self.cancel_grace = cancel_grace
+        # Spawned rather than forked, the event loop and its threads stay in this process
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = []
+        self.jobs = {}  # dict - job id:int -> Job, until the job is over
+        self.job_ids = itertools.count(1)
+        self.queue = None
+        self.executor = None
+        self.dispatchers = []
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        # One thread per worker waits on its pipe
+        self.executor = ThreadPoolExecutor(self.num_workers)
+        self.workers = [Worker(self.context, self.check_interval) for _ in range(self.num_workers)]
+        self.dispatchers = [asyncio.create_task(self.dispatch(i)) for i in range(self.num_workers)]
+
+    async def close(self):
+        for task in self.dispatchers:
+            task.cancel()
+        for worker in self.workers:
+            worker.close()
+        self.executor.shutdown(wait=False)
+
+    def submit(self, request):
+        """Queue a job request and return its Job, whose events stream the answer"""
+        if ("dimacs" in request) == ("path" in request):
+            raise ValueError("A job needs either a DIMACS payload or a file path")
+        unknown = set(request.get("budget", {})) - set(BUDGETS) | set(request.get("options", {})) - OPTIONS
+        if unknown:
+            raise ValueError(f"Unknown budgets or options {sorted(unknown)}")
+        job = Job(next(self.job_ids), request)
+        self.jobs[job.id] = job
+        job.events.put_nowait({"job": job.id, "status": "queued"})
+        self.queue.put_nowait(job)
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job, return False if there is no such job left"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancel_requested = True
+        if job.status == "queued":
+            # The dispatchers skip it
+            self.finish(job, {"status": "cancelled"})
+        elif job.status == "running":
+            job.worker.cancelled.value = job.id
+            asyncio.get_running_loop().call_later(self.cancel_grace, self.kill_if_running, job)
+        return True
+
+    def kill_if_running(self, job):
+        if job.status == "running" and job.worker.job is job:
+            job.worker.process.kill()
+
+    def finish(self, job, message):
+        job.status = message["status"]
+        message["job"] = job.id
+        job.events.put_nowait(message)
+        job.events.put_nowait(None)
+        self.jobs.pop(job.id, None)
+
+    def status(self):
+        running = [job.id for job in self.jobs.values() if job.status == "running"]
+        return {"status": "ok", "workers": self.num_workers, "queued": len(self.jobs) - len(running),
+                "running": running}
+
+    async def dispatch(self, index):
+        """Feed the jobs of the queue to worker `index` and relay its messages"""
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            if job.status != "queued":
+                continue
+            budget = job.request.get("budget", {}).get("memory")
+            memory = memory_mb(self.workers[index].process.pid) if budget is not None else None
+            if memory is not None and memory >= budget:
+                # The memory a warm worker kept from its earlier jobs would count against this one
+                self.workers[index].close()
+                self.workers[index] = Worker(self.context, self.check_interval)
+            worker = self.workers[index]
+            job.status = "running"
+            job.worker = worker
+            worker.job = job
+            job.events.put_nowait({"job": job.id, "status": "running"})
+            try:
+                await loop.run_in_executor(self.executor, worker.connection.send, (job.id, job.request))
+                while True:
+                    kind, _, payload = await loop.run_in_executor(self.executor, worker.connection.recv)
+                    if kind == "progress":
+                        job.events.put_nowait({"job": job.id, "status": "progress", "stats": payload})
+                        continue
+                    if kind == "error":
+                        self.finish(job, {"status": "error", "error": payload})
+                    elif job.cancel_requested and payload["stop_reason"] == "interrupted":
+                        self.finish(job, {"status": "cancelled", "stats": payload["stats"]})
+                    else:
+                        self.finish(job, {"status": "done", **payload})
+                    break
+            except (EOFError, OSError):
+                # The process was killed after a cancellation, or crashed: replace it
+                worker.close()
+                self.workers[index] = Worker(self.context, self.check_interval)
+                self.finish(job, {"status": "cancelled"} if job.cancel_requested
+                            else {"status": "error", "error": "worker process died"})
+            worker.job = None
+
+    async def stream(self, job, writer, tag):
+        """Write the messages of a job to a client"""
+        try:
+            while True:
+                message = await job.events.get()
+                if message is None:
+                    return
+                if tag is not None:
+                    message["tag"] = tag
+                writer.write(json.dumps(message).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            self.cancel(job.id)
+
+    async def handle_client(self, reader, writer):
+        jobs = []
+        streams = []
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # A line over MAX_LINE, the rest of the stream cannot be split into requests
+                    writer.write(json.dumps({"status": "error", "error": "request line too long"}).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    op = request.get("op", "solve")
+                    if op == "solve":
+                        job = self.submit(request)
+                        jobs.append(job)
+                        streams.append(asyncio.create_task(self.stream(job, writer, request.get("tag"))))
+                        continue
+                    if op == "cancel":
+                        reply = {"status": "ok", "job": request["job"], "found": self.cancel(request["job"])}
+                    elif op == "status":
+                        reply = self.status()
+                    else:
+                        raise ValueError(f"Unknown op {op}")
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    reply = {"status": "error", "error": repr(e)}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+            # The end of the requests, the answers are still streamed
+            await asyncio.gather(*streams)
+        except ConnectionError:
+            # A client that lost its connection does not need its answers anymore
+            for job in jobs:
+                self.cancel(job.id)
+        finally:
+            for task in streams:
+                task.cancel()
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, path=None):
+        """Serve on a Unix socket at `path` if given, on TCP `host`:`port` otherwise"""
+        await self.start()
+        if path:
+            server = await asyncio.start_unix_server(self.handle_client, path, limit=MAX_LINE)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.close()
+
+
+async def request(messages, host="127.0.0.1", port=8765, path=None):
+    """
+    Client: send job requests (dicts) to a service and yield every message it answers, until
+    each job is over
+    """
+    if path:
+        reader, writer = await asyncio.open_unix_connection(path, limit=MAX_LINE)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+    pending = 0
+    for message in messages:
+        writer.write(json.dumps(message).encode() + b"\n")
+        pending += 1
+    await writer.drain()
+    try:
+        while pending:
+            line = await reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            if message["status"] in ("done", "cancelled", "error", "ok"):
+                pending -= 1
+            yield message
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local solving service over a pool of warm processes")
+    parser.add_argument("command", choices=["serve", "submit"],
+                        help="run the service or submit CNF files to it")
+    parser.add_argument("files", nargs="*", help="CNF files to submit")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--socket", default=None, help="Unix socket path, instead of TCP")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, all cores by default")
+    parser.add_argument("--heuristic", default=None, help="branching heuristic, the solver's default if not given")
+    parser.add_argument("--restart", default=None, help="restart policy, as for CDCL.py")
+    parser.add_argument("--inline", action="store_true", help="send the file contents instead of their paths")
+    parser.add_argument("--progress", type=float, default=None, help="seconds between progress messages")
+    for budget in BUDGETS:
+        parser.add_argument(f"--max-{budget}", type=float if budget in ("time", "memory") else int, default=None,
+                            help=f"{budget} budget per job")
+    args = parser.parse_intermixed_args()
+
+    if args.command == "serve":
+        my_logger.init_logger()
+        try:
+            asyncio.run(SolverService(args.workers).serve(args.host, args.port, args.socket))
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    jobs = []
+    for filepath in args.files:
+        job = {"op": "solve", "tag": filepath,
+               "options": {name: getattr(args, name) for name in ("heuristic", "restart")
+                           if getattr(args, name) is not None},
+               "budget": {budget: getattr(args, f"max_{budget}") for budget in BUDGETS
+                          if getattr(args, f"max_{budget}") is not None},
+               "progress": args.progress}
+        if args.inline:
+            with open(filepath) as f:
+                job["dimacs"] = f.read()
+        else:
+            job["path"] = filepath
+        jobs.append(job)
+
+    async def print_messages():
+        async for message in request(jobs, args.host, args.port, args.socket):
+            message.pop("model", None)
+            print(json.dumps(message))
+
+    asyncio.run(print_messages())
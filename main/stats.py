@@ -0,0 +1,86 @@
+import sys
+import time
+
+
+class SolverStats:
+    """
+    Counters of a CDCLSolver, cumulated over its calls to solve(). Phase timers are only kept
+    once the solver's enable_timers has been called, so that the search pays nothing otherwise.
+    """
+
+    COUNTERS = ["num_decisions", "num_conflicts", "num_propagations", "num_restarts", "num_reductions",
+                "num_learnt", "num_learnt_kept", "num_learnt_deleted"]
+
+    def __init__(self):
+        self.num_decisions = 0  # number of pick branching var invocations
+        self.num_conflicts = 0
+        self.num_propagations = 0  # number of assigned literals propagated
+        self.num_restarts = 0
+        self.num_reductions = 0  # reductions of the learnt clause database
+        self.num_learnt = 0  # learnt clauses, deleted ones included
+        self.num_learnt_kept = 0  # learnt clauses left after the last reduction
+        self.num_learnt_deleted = 0  # total learnt clauses deleted by reductions
+        self.learnt_literals = 0  # total size of the learnt clauses
+        self.learnt_lbd = 0  # total LBD of the learnt clauses
+        self.phase_times = {}  # dict - phase:str -> cumulative seconds, empty unless timed
+        self.start_time = time.time()
+
+    @property
+    def average_learnt_size(self):
+        return self.learnt_literals / self.num_learnt if self.num_learnt else 0.0
+
+    @property
+    def average_lbd(self):
+        return self.learnt_lbd / self.num_learnt if self.num_learnt else 0.0
+
+    @property
+    def elapsed(self):
+        """Seconds since the solver was created"""
+        return time.time() - self.start_time
+
+    def on_learn(self, size, lbd):
+        self.num_learnt += 1
+        self.learnt_literals += size
+        self.learnt_lbd += lbd
+
+    def timed(self, phase, function):
+        """Wrap `function` so that its running time is added to phase_times[phase]"""
+        phase_times = self.phase_times
+        phase_times.setdefault(phase, 0.0)
+        depth = 0
+
+        def timed_function(*args, **kwargs):
+            nonlocal depth
+            # Recursive calls (BigBang picks through the other heuristics) are only timed once
+            depth += 1
+            start = time.perf_counter() if depth == 1 else None
+            try:
+                return function(*args, **kwargs)
+            finally:
+                depth -= 1
+                if start is not None:
+                    phase_times[phase] += time.perf_counter() - start
+
+        return timed_function
+
+    def as_dict(self):
+        """Counters, averages and phase times, for export"""
+        result = {counter: getattr(self, counter) for counter in self.COUNTERS}
+        result["average_learnt_size"] = self.average_learnt_size
+        result["average_lbd"] = self.average_lbd
+        result["elapsed"] = self.elapsed
+        for phase, seconds in self.phase_times.items():
+            result[f"time_{phase}"] = seconds
+        return result
+
+    def progress_line(self):
+        elapsed = self.elapsed
+        return (f"[Progress] {elapsed:.1f}s conflicts {self.num_conflicts} decisions {self.num_decisions} "
+                f"propagations/s {self.num_propagations / elapsed if elapsed else 0:.0f} "
+                f"restarts {self.num_restarts} learnt {self.num_learnt - self.num_learnt_deleted} "
+                f"avg size {self.average_learnt_size:.1f} avg LBD {self.average_lbd:.1f}")
+
+
+def print_progress(stats):
+    """Progress callback printing one line to stderr"""
+    print(stats.progress_line(), file=sys.stderr)
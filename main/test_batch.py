@@ -0,0 +1,87 @@
+import os
+import random
+import signal
+
+import batch
+from CDCL import CDCLSolver
+
+UNSAT = [[1, 2], [1, -2], [-1, 2], [-1, -2]]
+
+
+class KillsWorker:
+    """Clauses whose iteration kills the process, as the OOM killer would"""
+
+    def __iter__(self):
+        os.kill(os.getpid(), signal.SIGKILL)
+
+
+class HoldsMemory:
+    """Clauses whose iteration leaves 200 MB allocated in the process"""
+
+    held = []
+
+    def __init__(self, clauses):
+        self.clauses = clauses
+
+    def __iter__(self):
+        self.held.append(b"x" * (200 << 20))
+        return iter(self.clauses)
+
+
+def random_clauses(seed, num_variables=20, num_clauses=80):
+    rng = random.Random(seed)
+    return [[rng.choice((1, -1)) * v for v in rng.sample(range(1, num_variables + 1), 3)] for _ in range(num_clauses)]
+
+
+def is_model(answer, clauses):
+    return all(any(answer[abs(lit)] == (lit > 0) for lit in clause) for clause in clauses)
+
+
+def solve_all(inputs, **kwargs):
+    """dict - position in `inputs` -> (result, stats)"""
+    positions = {id(source): i for i, source in enumerate(inputs)}
+    return {positions[id(source)]: (answer, stats) for source, answer, stats in batch.solve_many(inputs, **kwargs)}
+
+
+def test_errors_are_reported_per_input():
+    inputs = [random_clauses(seed) for seed in range(20)] + [UNSAT, "missing.cnf"]
+    results = solve_all(inputs, workers=2, chunksize=3)
+    assert len(results) == len(inputs)
+    for i, clauses in enumerate(inputs[:20]):
+        answer = results[i][0]
+        assert answer == "UNSAT" or is_model(answer, clauses)
+    assert results[20][0] == "UNSAT"
+    assert results[21][0] == "ERROR"
+    assert "FileNotFoundError" in results[21][1]["error"]
+
+
+def test_killed_worker_only_fails_its_input():
+    inputs = [random_clauses(seed) for seed in range(30)]
+    inputs[7], inputs[23] = KillsWorker(), KillsWorker()
+    results = solve_all(inputs, workers=2, chunksize=4)
+    assert len(results) == len(inputs)
+    for i, (answer, stats) in results.items():
+        if i in (7, 23):
+            assert answer == "ERROR"
+            assert "BrokenProcessPool" in stats["error"]
+        else:
+            assert answer == "UNSAT" or is_model(answer, inputs[i])
+
+
+def test_solver_defaults_apply():
+    clauses = random_clauses(0, 50, 210)
+    random.seed(0)
+    solver = CDCLSolver.from_clauses(clauses)
+    solver.solve()
+    [(_, _, stats)] = batch.solve_many([clauses], workers=1)
+    assert stats["num_decisions"] == solver.stats.num_decisions
+
+
+def test_memory_kept_by_an_input_does_not_count_against_the_next_ones():
+    inputs = [random_clauses(seed) for seed in range(12)]
+    inputs[2] = HoldsMemory(inputs[2])
+    results = solve_all(inputs, workers=1, chunksize=4, options={"max_memory": 150})
+    assert len(results) == len(inputs)
+    for i, (answer, stats) in results.items():
+        if i != 2:
+            assert answer == "UNSAT" or is_model(answer, inputs[i])
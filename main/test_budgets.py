@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+import CDCL
+from CDCL import CDCLSolver
+
+
+def random_clauses(seed, num_variables=50, num_clauses=210):
+    rng = random.Random(seed)
+    return [[rng.choice((1, -1)) * v for v in rng.sample(range(1, num_variables + 1), 3)] for _ in range(num_clauses)]
+
+
+def test_conflict_budget_resumes():
+    solver = CDCLSolver.from_clauses(random_clauses(0), "VSIDS")
+    solver.max_conflicts = 1
+    assert solver.solve() == "UNKNOWN"
+    assert solver.stop_reason == "conflicts"
+    solver.max_conflicts = None
+    assert solver.solve() != "UNKNOWN"
+
+
+def test_memory_budget_stops_and_resumes():
+    solver = CDCLSolver.from_clauses(random_clauses(1), "VSIDS")
+    solver.max_memory = 1
+    assert solver.solve() == "UNKNOWN"
+    assert solver.stop_reason == "memory"
+    solver.max_memory = None
+    assert solver.solve() != "UNKNOWN"
+
+
+@pytest.mark.skipif(CDCL.memory_mb() is None, reason="current memory usage is not available")
+def test_memory_budget_ignores_memory_freed_before_solving():
+    # Raises the peak memory of the process well above the budget, then frees it
+    allocation = b"x" * (200 << 20)
+    del allocation
+    solver = CDCLSolver.from_clauses(random_clauses(2), "VSIDS")
+    solver.max_memory = CDCL.memory_mb() + 100
+    assert solver.solve() != "UNKNOWN"
+    assert solver.stop_reason is None
@@ -0,0 +1,48 @@
+from array import array
+
+import drat
+from CDCL import CDCLSolver
+
+# Every pair of values of 1 and 2 is excluded, which unit propagation alone does not refute, and -3 is implied
+FORMULA = [[-3, 4], [-3, -4], [1, 2], [1, -2], [-1, 2], [-1, -2]]
+
+
+def write_proof(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_rat_lemma_checked_on_its_first_literal(tmp_path):
+    # "5 3 0" is RAT on the fresh 5 only. Checking "5 0" propagates it on 3 and reorders its
+    # literals, the pivot must still be 5.
+    proof = write_proof(tmp_path / "proof.drat", "5 3 0\n5 0\n-5 1 0\n0\n")
+    assert drat.check_proof(FORMULA, proof) == (True, None)
+
+
+def test_extended_resolution_definition():
+    # -3 is implied, then 1 and 2 must take every pair of values. 5 <-> (1 or 3) is defined
+    # by RAT lemmas and every lemma of the refutation depends on it.
+    formula = [[-3, 4], [-3, -4], [3, 1, 2], [3, 1, -2], [3, -1, 2], [3, -1, -2]]
+    lemmas = [[-5, 1, 3], [5, -1], [5, -3], [5, 2], [5], [-3], []]
+    checker = drat.DRATChecker(formula)
+    assert checker.check([(False, lemma) for lemma in lemmas]) == (True, None)
+    assert checker.num_checked == len(lemmas)
+
+
+def test_lemma_neither_rup_nor_rat_is_rejected(tmp_path):
+    proof = write_proof(tmp_path / "proof.drat", "1 3 0\n0\n")
+    verified, reason = drat.check_proof(FORMULA, proof)
+    assert not verified
+    assert reason is not None
+
+
+def test_solver_proof_verifies(tmp_path):
+    for binary in (False, True):
+        path = str(tmp_path / "proof.drat")
+        literals = array("i")
+        for clause in FORMULA:
+            literals.extend(clause + [0])
+        with drat.ProofWriter(path, binary=binary) as proof:
+            solver = CDCLSolver(None, "VSIDS", formula=(literals, 4, len(FORMULA)), proof=proof)
+            assert solver.solve() == "UNSAT"
+        assert drat.check_proof(FORMULA, path, binary) == (True, None)
@@ -0,0 +1,51 @@
+import itertools
+import random
+
+import pytest
+
+from CDCL import CDCLSolver, TRUE
+
+
+def random_clauses(rng, num_variables):
+    clauses = []
+    for _ in range(rng.randint(1, 3 * num_variables)):
+        variables = rng.sample(range(1, num_variables + 1), rng.randint(1, min(3, num_variables)))
+        clauses.append([rng.choice((1, -1)) * v for v in variables])
+    return clauses
+
+
+def brute_force_count(clauses, num_variables, project_on):
+    projections = set()
+    for values in itertools.product((False, True), repeat=num_variables):
+        if all(any(values[abs(lit) - 1] == (lit > 0) for lit in clause) for clause in clauses):
+            projections.add(tuple(values[var - 1] for var in project_on))
+    return len(projections)
+
+
+@pytest.mark.parametrize("preprocess", [False, True])
+def test_count_models_matches_brute_force(preprocess):
+    rng = random.Random(0)
+    for _ in range(300):
+        num_variables = rng.randint(1, 7)
+        clauses = random_clauses(rng, num_variables)
+        variables = sorted(set(abs(lit) for clause in clauses for lit in clause))
+        project_on = sorted(rng.sample(variables, rng.randint(1, len(variables))))
+        for projection in (None, project_on):
+            solver = CDCLSolver.from_clauses(clauses, "VSIDS", preprocess=preprocess)
+            expected = brute_force_count(clauses, num_variables, projection or variables)
+            assert solver.count_models(project_on=projection) == expected, (clauses, projection)
+
+
+def test_eliminated_projected_variable():
+    # -4 is pure and removed by preprocessing
+    solver = CDCLSolver.from_clauses([[-3, -1, -2], [2, -1, -4], [-1, 3, 2]], preprocess=True)
+    assert solver.count_models(project_on=[4]) == 2
+
+
+def test_models_with_preprocessing_satisfy_the_input():
+    clauses = [[1, 2], [-1, 3], [-2, 3], [3, 4, 5], [-5, 1]]
+    solver = CDCLSolver.from_clauses(clauses, preprocess=True)
+    models = [tuple(sorted(model.items())) for model in solver.iter_models()]
+    assert len(models) == len(set(models)) == brute_force_count(clauses, 5, [1, 2, 3, 4, 5])
+    for model in map(dict, models):
+        assert all(any((model[abs(lit)] == TRUE) == (lit > 0) for lit in clause) for clause in clauses)
@@ -0,0 +1,63 @@
+import itertools
+import random
+
+from preprocess import Preprocessor
+
+
+class RecordedProof:
+    """Stands for a drat.ProofWriter, keeping the steps in memory"""
+
+    def __init__(self):
+        self.steps = []
+
+    def add(self, literals):
+        self.steps.append(("a", list(literals)))
+
+    def delete(self, literals):
+        self.steps.append(("d", list(literals)))
+
+
+def satisfies(model, clauses):
+    return all(any(model.get(abs(lit), False) == (lit > 0) for lit in clause) for clause in clauses)
+
+
+def brute_force_model(clauses):
+    variables = sorted(set(abs(lit) for clause in clauses for lit in clause))
+    for values in itertools.product((False, True), repeat=len(variables)):
+        model = dict(zip(variables, values))
+        if satisfies(model, clauses):
+            return model
+    return None
+
+
+def test_subsumption_and_self_subsumption():
+    preprocessor = Preprocessor([[1, 2], [1, 2, 3], [-1, 2, 4]])
+    preprocessor.subsume_all()
+    remaining = sorted(sorted(clause) for clause in preprocessor.clauses if clause is not None)
+    assert remaining == [[1, 2], [2, 4]]
+    assert preprocessor.num_subsumed == 1
+    assert preprocessor.num_strengthened == 1
+
+
+def test_strengthened_unit_is_not_deleted_from_proof():
+    proof = RecordedProof()
+    preprocessor = Preprocessor([[1], [-1, 2, 3], [-3, 4]], proof=proof)
+    preprocessor.pending_units.append(-3)
+    preprocessor.propagate_units()
+    assert ("a", [2]) in proof.steps
+    assert ("d", [2]) not in proof.steps
+    assert preprocessor.units == [1, -3, 2]
+
+
+def test_extended_model_satisfies_original_formula():
+    rng = random.Random(0)
+    for _ in range(50):
+        clauses = [[rng.choice((1, -1)) * rng.randint(1, 8) for _ in range(3)] for _ in range(rng.randint(5, 30))]
+        preprocessor = Preprocessor(clauses)
+        simplified = preprocessor.run()
+        if preprocessor.unsat:
+            assert brute_force_model(clauses) is None
+            continue
+        model = brute_force_model(simplified)
+        assert model is not None
+        assert satisfies(preprocessor.extend_model(model), clauses)
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import random
+
+import my_parser
+from CDCL import CDCLSolver
+from solver_service import MAX_LINE, SolverService
+
+SAT_DIMACS = "p cnf 3 2\n1 -2 0\n2 3 0\n"
+UNSAT_DIMACS = "p cnf 2 4\n1 2 0\n1 -2 0\n-1 2 0\n-1 -2 0\n"
+
+
+def random_dimacs(num_variables, num_clauses, seed=0):
+    """Random 3-SAT formula, hard around 4.26 clauses per variable"""
+    rng = random.Random(seed)
+    lines = [f"p cnf {num_variables} {num_clauses}"]
+    for _ in range(num_clauses):
+        lines.append(" ".join(str(rng.choice((1, -1)) * v) for v in rng.sample(range(1, num_variables + 1), 3)) + " 0")
+    return "\n".join(lines) + "\n"
+
+
+async def with_service(client, limit=MAX_LINE, **kwargs):
+    """Run `client(reader, writer)` connected to a service with one worker"""
+    service = SolverService(workers=1, **kwargs)
+    await service.start()
+    handlers = []
+
+    async def handle_client(reader, writer):
+        handlers.append(asyncio.current_task())
+        await service.handle_client(reader, writer)
+
+    try:
+        server = await asyncio.start_server(handle_client, "127.0.0.1", 0, limit=limit)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            try:
+                return await asyncio.wait_for(client(reader, writer), 60)
+            finally:
+                writer.close()
+                # Let the service see the connection closed
+                await asyncio.gather(*handlers)
+    finally:
+        await service.close()
+
+
+def send(writer, message):
+    writer.write(json.dumps(message).encode() + b"\n")
+
+
+async def read_until_over(reader, num_jobs):
+    """Messages received until `num_jobs` jobs are over"""
+    messages = []
+    while num_jobs:
+        line = await reader.readline()
+        assert line, "connection closed before the jobs were answered"
+        messages.append(json.loads(line))
+        if messages[-1]["status"] in ("done", "cancelled", "error"):
+            num_jobs -= 1
+    return messages
+
+
+def test_answers_after_client_shuts_down_writing():
+    async def client(reader, writer):
+        send(writer, {"op": "solve", "dimacs": SAT_DIMACS, "tag": "sat"})
+        send(writer, {"op": "solve", "dimacs": UNSAT_DIMACS, "tag": "unsat"})
+        await writer.drain()
+        writer.write_eof()
+        return await read_until_over(reader, 2)
+
+    messages = asyncio.run(with_service(client))
+    answers = {m["tag"]: m for m in messages if m["status"] == "done"}
+    assert answers["unsat"]["answer"] == "UNSAT"
+    assert answers["sat"]["answer"] == "SAT"
+    model = set(answers["sat"]["model"])
+    assert all(any(lit in model for lit in clause) for clause in ([1, -2], [2, 3]))
+
+
+def test_cancel_running_job():
+    async def client(reader, writer):
+        send(writer, {"op": "solve", "dimacs": random_dimacs(200, 852), "options": {"heuristic": "Ordered"}})
+        await writer.drain()
+        messages = []
+        while not messages or messages[-1]["status"] != "running":
+            messages.append(json.loads(await reader.readline()))
+        send(writer, {"op": "cancel", "job": messages[-1]["job"]})
+        await writer.drain()
+        return messages + await read_until_over(reader, 1)
+
+    messages = asyncio.run(with_service(client, check_interval=10))
+    assert {"status": "ok", "job": messages[0]["job"], "found": True} in messages
+    assert messages[-1]["status"] == "cancelled"
+
+
+def test_invalid_requests_are_answered_with_errors():
+    async def client(reader, writer):
+        send(writer, {"op": "solve", "dimacs": SAT_DIMACS, "budget": {"lifetime": 1}})
+        send(writer, {"op": "frobnicate"})
+        writer.write(b"not json\n")
+        await writer.drain()
+        writer.write_eof()
+        return [json.loads(await reader.readline()) for _ in range(3)]
+
+    messages = asyncio.run(with_service(client))
+    assert [m["status"] for m in messages] == ["error"] * 3
+
+
+def test_memory_budget_after_large_job():
+    # The large job raises the peak memory of the worker well above the budget of the next one
+    async def client(reader, writer):
+        send(writer, {"op": "solve", "dimacs": random_dimacs(100000, 300000), "options": {"heuristic": "VSIDS"},
+                      "budget": {"conflicts": 0}})
+        send(writer, {"op": "solve", "dimacs": SAT_DIMACS, "budget": {"memory": 100}})
+        await writer.drain()
+        return await read_until_over(reader, 2)
+
+    messages = asyncio.run(with_service(client))
+    done = [m for m in messages if m["status"] == "done"]
+    assert [m["answer"] for m in done] == ["UNKNOWN", "SAT"]
+
+
+def test_line_over_limit_is_answered():
+    async def client(reader, writer):
+        send(writer, {"op": "solve", "dimacs": SAT_DIMACS})
+        send(writer, {"op": "solve", "dimacs": random_dimacs(1000, 4000)})
+        await writer.drain()
+        # The service answers the job in flight, then closes the connection
+        return [json.loads(line) async for line in reader]
+
+    messages = asyncio.run(with_service(client, limit=1 << 12))
+    assert {"status": "error", "error": "request line too long"} in messages
+    assert [m["answer"] for m in messages if m["status"] == "done"] == ["SAT"]
+
+
+def test_solver_defaults_apply():
+    dimacs = random_dimacs(50, 210, seed=3)
+    random.seed(0)
+    solver = CDCLSolver(None, formula=my_parser.parse_dimacs(dimacs))
+    solver.solve()
+
+    async def client(reader, writer):
+        send(writer, {"op": "solve", "dimacs": dimacs})
+        await writer.drain()
+        return await read_until_over(reader, 1)
+
+    [done] = [m for m in asyncio.run(with_service(client)) if m["status"] == "done"]
+    assert done["stats"]["num_decisions"] == solver.stats.num_decisions
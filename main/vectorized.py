@@ -0,0 +1,179 @@
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import clause_arena
+
+TRUE = 1
+FALSE = 0
+UNDEFINED = -1
+
+# Heuristics scored here, the others keep their own implementation in CDCL.py
+HEURISTICS = {"DLIS", "RDLIS", "DLCS", "RDLCS", "JW", "MOM", "2-Clause", "Lishuo", "Lishuo2"}
+
+
+class ClauseMatrix:
+    """
+    The clauses of a ClauseArena as a CSR matrix: clause i has the literals at arena positions
+    positions[indptr[i]:indptr[i + 1]]. Clauses appended to the arena are added on update(),
+    and the matrix is rebuilt after a garbage collection moved them.
+    """
+
+    def __init__(self, arena):
+        self.arena = arena
+        self.data = None  # the arena array the matrix was built from
+        self.scanned = 0  # length of the arena array already in the matrix
+        self.crefs = np.zeros(0, dtype=np.int64)
+        self.sizes = np.zeros(0, dtype=np.int64)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.positions = np.zeros(0, dtype=np.int64)
+        self.clause_of = np.zeros(0, dtype=np.int64)  # clause index of every entry
+
+    def update(self):
+        data = self.arena.data
+        if data is not self.data:
+            self.__init__(self.arena)
+            self.data = data
+        if self.scanned == len(data):
+            return
+        crefs = []
+        cref = self.scanned
+        while cref < len(data):
+            crefs.append(cref)
+            cref += clause_arena.HEADER + data[cref]
+        self.scanned = cref
+
+        crefs = np.array(crefs, dtype=np.int64)
+        sizes = np.array([data[c] for c in crefs], dtype=np.int64)
+        # Entry k of a new clause is at arena position cref + HEADER + k
+        offsets = np.cumsum(sizes) - sizes
+        positions = np.repeat(crefs + clause_arena.HEADER - offsets, sizes) + np.arange(sizes.sum())
+        first = len(self.crefs)
+        self.crefs = np.concatenate([self.crefs, crefs])
+        self.sizes = np.concatenate([self.sizes, sizes])
+        self.indptr = np.concatenate([self.indptr, self.indptr[-1] + np.cumsum(sizes)])
+        self.positions = np.concatenate([self.positions, positions])
+        self.clause_of = np.concatenate([self.clause_of, np.repeat(np.arange(first, len(self.crefs)), sizes)])
+
+    def read(self):
+        """Return the literal of every entry and whether every clause is still live"""
+        self.update()
+        # The view is dropped before returning, the arena cannot grow while it is exported
+        data = np.frombuffer(self.arena.data, dtype=np.int32)
+        literals = data[self.positions]
+        live = (data[self.crefs + 1] & clause_arena.DELETED) == 0
+        return literals, live
+
+
+class VectorizedScores:
+    """
+    Scores of the counting heuristics computed with NumPy reductions over a ClauseMatrix,
+    instead of Python loops over every clause. Literal l is indexed by its code 2 * |l| + (l < 0).
+    Like LiteralCounters, occurrences are counted over all clauses, learnt ones included,
+    and only literals of unassigned variables are considered. Ties may be broken differently
+    from the pure Python heuristics.
+    """
+
+    def __init__(self, arena):
+        if np is None:
+            raise ImportError("Vectorized scoring needs NumPy")
+        self.matrix = ClauseMatrix(arena)
+
+    def pick(self, heuristic, assignments):
+        """Return (variable, value) to branch on with `heuristic`"""
+        matrix = self.matrix
+        literals, live = matrix.read()
+        values = np.array(assignments, dtype=np.int8)
+        variables = np.abs(literals)
+        codes = 2 * variables + (literals < 0)
+        num_codes = 2 * len(values)
+        entry_values = values[variables]
+        unassigned = entry_values == UNDEFINED
+        true = entry_values == np.where(literals > 0, TRUE, FALSE)
+        counted = live[matrix.clause_of] & unassigned
+        counts = np.bincount(codes[counted], minlength=num_codes)
+
+        if heuristic in ("DLIS", "RDLIS"):
+            return self.best_literal(counts, heuristic == "RDLIS")
+
+        if heuristic in ("DLCS", "RDLCS"):
+            variable = self.best(counts[0::2] + counts[1::2], heuristic == "RDLCS")
+            return variable, TRUE if counts[2 * variable] > counts[2 * variable + 1] else FALSE
+
+        if heuristic == "JW":
+            weights = np.power(2.0, -matrix.sizes)[matrix.clause_of[counted]]
+            return self.best_literal(np.bincount(codes[counted], weights=weights, minlength=num_codes))
+
+        if heuristic == "MOM":
+            satisfied = np.bincount(matrix.clause_of, weights=true, minlength=len(live)) > 0
+            unresolved = live & ~satisfied
+            if unresolved.any():
+                # Only the smallest clauses that are not satisfied yet count
+                smallest = unresolved & (matrix.sizes == matrix.sizes[unresolved].min())
+                counts = np.bincount(codes[smallest[matrix.clause_of] & unassigned], minlength=num_codes)
+            negated = counts.reshape(-1, 2)[:, ::-1].ravel()
+            scores = (counts + negated) * 4.0 + counts * negated
+            scores[counts == 0] = -1
+            return self.best_literal(scores)
+
+        # Clauses with exactly two unassigned literals, as pairs of literal codes
+        two_clauses = live & (np.bincount(matrix.clause_of, weights=unassigned, minlength=len(live)) == 2)
+        pairs = codes[two_clauses[matrix.clause_of] & unassigned].reshape(-1, 2)
+
+        if heuristic == "2-Clause":
+            if len(pairs) == 0:
+                candidates = np.flatnonzero(values == UNDEFINED)
+                candidates = candidates[np.isin(candidates, variables[counted])]
+                return int(random.choice(candidates)), TRUE
+            return self.best(np.bincount(pairs.ravel() // 2, minlength=len(values)), True), TRUE
+
+        if heuristic == "Lishuo":
+            # A two-clause (a, b) adds the count of b to -a and the count of a to -b
+            scores = counts.copy()
+            for source, other in ((pairs[:, 0] ^ 1, pairs[:, 1]), (pairs[:, 1] ^ 1, pairs[:, 0])):
+                keep = counts[source] > 0
+                np.add.at(scores, source[keep], counts[other[keep]])
+            scores[counts == 0] = -1
+            return self.best_literal(scores)
+
+        if heuristic == "Lishuo2":
+            # Sum the counts of the literals reachable in at most two steps through the
+            # implications -a -> b and -b -> a of the two-clauses, each literal counted once
+            sources = np.concatenate([pairs[:, 0] ^ 1, pairs[:, 1] ^ 1])
+            targets = np.concatenate([pairs[:, 1], pairs[:, 0]])
+            edges = np.unique(sources * num_codes + targets)
+            sources, targets = edges // num_codes, edges % num_codes
+            degrees = np.bincount(sources, minlength=num_codes)
+            starts = np.cumsum(degrees) - degrees
+            two_step_degrees = degrees[targets]
+            offsets = np.cumsum(two_step_degrees) - two_step_degrees
+            second = targets[np.repeat(starts[targets] - offsets, two_step_degrees) +
+                             np.arange(two_step_degrees.sum())]
+            all_codes = np.arange(num_codes)
+            reachable = np.unique(np.concatenate([
+                all_codes * num_codes + all_codes,
+                edges,
+                np.repeat(sources, two_step_degrees) * num_codes + second]))
+            scores = np.bincount(reachable // num_codes, weights=counts[reachable % num_codes], minlength=num_codes)
+            # Literals of unassigned variables of the formula
+            candidates = np.zeros(num_codes, dtype=bool)
+            candidates[codes[counted]] = True
+            candidates[codes[counted] ^ 1] = True
+            scores[~candidates] = -1
+            return self.best_literal(scores)
+
+        raise ValueError(f"Heuristic {heuristic} is not vectorized")
+
+    @staticmethod
+    def best(scores, random_ties=False):
+        """Index of the highest score, a random one among the ties with `random_ties`"""
+        if random_ties:
+            return int(random.choice(np.flatnonzero(scores == scores.max())))
+        return int(np.argmax(scores))
+
+    def best_literal(self, scores, random_ties=False):
+        code = self.best(scores, random_ties)
+        return code // 2, FALSE if code & 1 else TRUE